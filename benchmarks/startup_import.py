@@ -0,0 +1,51 @@
+"""
+Measures the cost of importing main.py (app startup) in fresh interpreters.
+
+    python benchmarks/startup_import.py --runs 5 --top 15
+
+Reports the median wall time of `import main` and the modules with the largest cumulative import
+time (from `python -X importtime`). Run it before and after changes that touch module-level setup.
+Importing main also runs create_tables(), so DATABASE_URL must point at a reachable database.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_import(module: str) -> float:
+    """Wall time of importing `module` in a fresh interpreter, in seconds."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=PROJECT_ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+def slowest_imports(module: str, top: int):
+    """Returns [(cumulative_seconds, module_name)] for the `top` slowest imports, parsed from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=PROJECT_ROOT,
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the import (startup) cost of the FastAPI app.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    durations = [time_import(args.module) for _ in range(args.runs)]
+    print(f"import {args.module}: median {statistics.median(durations):.3f}s, "
+          f"min {min(durations):.3f}s, max {max(durations):.3f}s over {args.runs} runs")
+
+    print("\nSlowest imports (cumulative):")
+    for seconds, name in slowest_imports(args.module, args.top):
+        print(f"  {seconds:8.3f}s  {name}")
@@ -0,0 +1,108 @@
+"""
+Compares the agent and direct title-generation paths against the configured Ollama model.
+
+    python benchmarks/title_generation.py --runs 3 "how to lose weight fast" "minecraft hardcore tips"
+
+For every topic and run it times both paths and records the number of LLM calls, the Ollama token counts
+(prompt_eval_count / eval_count) and whether five titles came back. The semantic cache and conversation
+memory are bypassed so every call reaches the model.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.callbacks import BaseCallbackHandler
+from service.title_generator_service import (
+    generate_titles_prompt,
+    generate_titles_with_agent,
+    generate_titles_direct,
+    render_direct_prompt,
+    process_generated_titles,
+    MAX_TITLES,
+)
+
+DEFAULT_TOPICS = [
+    "how to lose weight fast",
+    "minecraft hardcore survival tips",
+    "iphone 17 review",
+    "budget travel in japan",
+]
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """Counts LLM calls and sums Ollama's token counts across an agent run."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        self.calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                self.prompt_tokens += info.get("prompt_eval_count") or 0
+                self.completion_tokens += info.get("eval_count") or 0
+
+def run_agent(topic: str):
+    handler = LLMUsageHandler()
+    started = time.perf_counter()
+    titles = process_generated_titles(generate_titles_with_agent(generate_titles_prompt(topic), callbacks=[handler]))
+    return {
+        "seconds": time.perf_counter() - started,
+        "calls": handler.calls,
+        "prompt_tokens": handler.prompt_tokens,
+        "completion_tokens": handler.completion_tokens,
+        "complete": len(titles) == MAX_TITLES,
+    }
+
+def run_direct(topic: str):
+    started = time.perf_counter()
+    titles, info = generate_titles_direct(render_direct_prompt(topic))
+    return {
+        "seconds": time.perf_counter() - started,
+        "calls": 1,
+        "prompt_tokens": info["prompt_tokens"] or 0,
+        "completion_tokens": info["completion_tokens"] or 0,
+        "complete": len(titles) == MAX_TITLES,
+    }
+
+def summarize(name: str, samples):
+    if not samples:
+        print(f"{name:>6}: no successful runs")
+        return
+    print(
+        f"{name:>6}: median {statistics.median(s['seconds'] for s in samples):6.2f}s  "
+        f"p-max {max(s['seconds'] for s in samples):6.2f}s  "
+        f"calls {statistics.mean(s['calls'] for s in samples):4.1f}  "
+        f"prompt tok {statistics.mean(s['prompt_tokens'] for s in samples):7.1f}  "
+        f"completion tok {statistics.mean(s['completion_tokens'] for s in samples):6.1f}  "
+        f"5 titles {sum(s['complete'] for s in samples)}/{len(samples)}"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark agent vs direct title generation.")
+    parser.add_argument("topics", nargs="*", default=DEFAULT_TOPICS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {"agent": [], "direct": []}
+    failures = {"agent": 0, "direct": 0}
+    for _ in range(args.runs):
+        for topic in args.topics:
+            for name, run in (("agent", run_agent), ("direct", run_direct)):
+                try:
+                    results[name].append(run(topic))
+                except Exception as e:
+                    failures[name] += 1
+                    print(f"{name} failed for {topic!r}: {e}")
+
+    print(f"\n{len(args.topics)} topics x {args.runs} runs")
+    for name in ("agent", "direct"):
+        summarize(name, results[name])
+        if failures[name]:
+            print(f"{'':>8}{failures[name]} failed runs")
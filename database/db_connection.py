@@ -1,9 +1,13 @@
 import os
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from database.models import Base  
+from database.migrations import run_migrations
+from service.search_index import create_search_index
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.dialects import postgresql, sqlite
 
 
 load_dotenv(override=True)
@@ -17,9 +21,29 @@ def create_tables():
     """Import models and create tables"""
     try:
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        create_search_index(engine)
     except Exception as e:
         print("❌ Error creating tables:", e)
 
+def dialect_insert(db, model):
+    """INSERT construct with ON CONFLICT support for the session's backend (PostgreSQL, or SQLite for local dev)."""
+    if db.bind.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+@contextmanager
+def session_scope(db=None):
+    """Yields the caller's session, or a short-lived SessionLocal() that is closed on exit when `db` is None."""
+    if db is not None:
+        yield db
+        return
+    own_session = SessionLocal()
+    try:
+        yield own_session
+    finally:
+        own_session.close()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+
+# Columns added to tables that existing deployments already have; Base.metadata.create_all only creates
+# missing tables, never missing columns. (table, column, DDL type) - kept portable across PostgreSQL and SQLite.
+ADDED_COLUMNS = [
+    ("channels", "updated_at", "TIMESTAMP"),
+    ("videos", "updated_at", "TIMESTAMP"),
+    ("videos", "view_acceleration", "FLOAT DEFAULT 0"),
+    ("videos", "keywords_indexed_at", "TIMESTAMP"),
+]
+
+# Indexes declared with index=True on pre-existing columns, named the way create_all names them.
+ADDED_INDEXES = [
+    ("ix_trending_topics_trend_score", "trending_topics", "trend_score"),
+    ("ix_trending_topics_trend_growth", "trending_topics", "trend_growth"),
+]
+
+def run_migrations(engine):
+    """Brings an existing database up to the current models; every step is skipped once applied."""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table, column, ddl_type in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+                print(f"Migrating: adding {table}.{column}")
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+        for index_name, table, column in ADDED_INDEXES:
+            if table in tables:
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})"))
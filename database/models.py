@@ -1,7 +1,7 @@
 import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, String, Integer, Text, DateTime, func, JSON, ForeignKey, Boolean, Float, BigInteger
+from sqlalchemy import Column, String, Integer, Text, Date, DateTime, func, JSON, ForeignKey, Boolean, Float, BigInteger
 
 Base = declarative_base()
 
@@ -83,6 +83,7 @@ class Channel(Base):
     total_subscribers = Column(BigInteger, default=0)
     total_videos = Column(BigInteger, default=0)
     country = Column(String(50))
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     videos = relationship("Video", back_populates="channel", cascade="all, delete-orphan")
 
@@ -103,26 +104,75 @@ class Video(Base):
     engagement_rate = Column(Float, default=0.0)
     view_to_subscriber_ratio = Column(Float, default=0.0) 
     view_velocity = Column(Float, default=0.0)
+    view_acceleration = Column(Float, default=0.0)
     video_url = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+    keywords_indexed_at = Column(DateTime, nullable=True)  # Set once the title is counted in keyword_document_frequencies
     
     channel = relationship("Channel", back_populates="videos")  
 
     trending_topics = relationship("TrendingTopic", back_populates="video", cascade="all, delete-orphan")
     saved_by_users = relationship("UserSavedVideo", back_populates="video", cascade="all, delete-orphan")
 
+class VideoStatsSnapshot(Base):
+    __tablename__ = "video_stats_snapshots"
+
+    # Composite key doubles as the (video_id, captured_at DESC) lookup index.
+    video_id = Column(String(50), ForeignKey("videos.video_id", ondelete="CASCADE"), primary_key=True)
+    captured_at = Column(DateTime, primary_key=True)
+    views = Column(BigInteger, nullable=False)
+    likes = Column(BigInteger, nullable=False, default=0)
+    comments = Column(BigInteger, nullable=False, default=0)
+
 class TrendingTopic(Base):
     __tablename__ = "trending_topics"
 
     trend_id = Column(Integer, primary_key=True, autoincrement=True)
     video_id = Column(String(50), ForeignKey("videos.video_id", ondelete="CASCADE"), nullable=False)
     trend_category = Column(String(100))
-    trend_score = Column(Float)
-    trend_growth = Column(Float)
+    trend_score = Column(Float, index=True)
+    trend_growth = Column(Float, index=True)
     keyword = Column(String, unique=True, nullable=False)  
     count = Column(Integer, nullable=False, default=0)  
 
     video = relationship("Video", back_populates="trending_topics")
 
+class KeywordDocumentFrequency(Base):
+    __tablename__ = "keyword_document_frequencies"
+
+    term = Column(String(100), primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)
+
+class KeywordCorpus(Base):
+    __tablename__ = "keyword_corpus"
+
+    # Single row (id=1) holding the number of titles counted into keyword_document_frequencies.
+    id = Column(Integer, primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)
+
+class BackfillCheckpoint(Base):
+    __tablename__ = "backfill_checkpoints"
+
+    job_name = Column(String(50), primary_key=True)
+    status = Column(String(20), nullable=False, default="running")  # "running" or "completed"
+    last_video_id = Column(String(50), nullable=True)  # Videos are processed in video_id order; resume after this one
+    processed_videos = Column(BigInteger, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class Transcript(Base):
+    __tablename__ = "transcripts"
+
+    # No FK to videos: remix URLs can point at videos that were never stored.
+    video_id = Column(String(50), primary_key=True)
+    source = Column(String(20), nullable=False)  # "captions", "whisper" or "vosk"
+    language = Column(String(20), nullable=True)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # sha256 of content
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class UserSavedVideo(Base):
     __tablename__ = "user_saved_videos"
 
@@ -144,3 +194,20 @@ class GeneratedTitle(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
 
     user = relationship("User", back_populates="generated_titles")
+
+class YoutubeQuotaLedger(Base):
+    __tablename__ = "youtube_quota_ledger"
+
+    quota_day = Column(Date, primary_key=True)  # Pacific date: YouTube resets the daily quota at midnight PT
+    user_key = Column(String(50), primary_key=True)  # user id, "anonymous", or "*" for the project total
+    endpoint = Column(String(50), primary_key=True)  # endpoint name, or "*" for the user's total
+    units = Column(Integer, nullable=False, default=0)
+    calls = Column(Integer, nullable=False, default=0)
+
+class ApiResponseCache(Base):
+    __tablename__ = "api_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    endpoint = Column(String(50), nullable=False)
+    response = Column(JSON, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
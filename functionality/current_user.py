@@ -1,12 +1,13 @@
 from datetime import datetime
 from database.models import User
 from sqlalchemy.orm import Session
-from database.db_connection import get_db
+from database.db_connection import get_db, SessionLocal
 from fastapi import HTTPException, Depends
 from functionality.jwt_token import decodeJWT
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 jwt_bearer = HTTPBearer()
+optional_jwt_bearer = HTTPBearer(auto_error=False)
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(jwt_bearer), db: Session = Depends(get_db)):
     token = credentials.credentials
@@ -32,3 +33,24 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(jwt_bea
         raise HTTPException(status_code=404, detail="❌ User not found.")
 
     return user
+
+def get_optional_current_user(credentials: HTTPAuthorizationCredentials = Depends(optional_jwt_bearer), db: Session = Depends(get_db)):
+    """Returns the authenticated user, or None when the request carries no bearer token."""
+    if credentials is None:
+        return None
+    return get_current_user(credentials, db)
+
+def get_websocket_user(token: str):
+    """
+    Resolves the user of a WebSocket connection from its JWT, or returns None.
+    Browsers cannot set headers on WebSocket handshakes, so the token usually arrives as ?token=.
+    """
+    token_data = decodeJWT(token) if token else None
+    if not token_data or not token_data["valid"]:
+        return None
+
+    db = SessionLocal()
+    try:
+        return db.query(User).filter(User.id == token_data["payload"]["user_id"]).first()
+    finally:
+        db.close()
@@ -1,12 +1,12 @@
 from langgraph.graph import StateGraph
-from service.script_service import generate_script, get_video_details, fetch_transcript, format_script_response
+from service.script_service import generate_script, get_video_details, fetch_transcript, format_script_response, stream_script, IncrementalScriptFormatter
 from database.models import RemixedScript, Script
 
 # --- AGENTS ---
 
 def search_agent(state):
     idea = state.get("idea") or state.get("title")
-    videos = get_video_details(idea, max_results=2)
+    videos = get_video_details(idea, max_results=2, user_id=state.get("user_id"))
     return {**state, "videos": videos}
 
 
@@ -41,10 +41,15 @@ def past_script_agent(state):
     return {**state, "past_scripts_text": past_content}
 
 
-def script_gen_agent(state):
+def combine_transcripts(state):
     combined_transcript = "\n".join(state.get("transcripts", []))
     if state.get("past_scripts_text"):
         combined_transcript += f"\n\n{state['past_scripts_text']}"
+    return combined_transcript
+
+
+def script_gen_agent(state):
+    combined_transcript = combine_transcripts(state)
 
     generated_script = generate_script(
         combined_transcript,
@@ -77,9 +82,19 @@ def remix_script_agent(state):
     if "I can't help with this request." in formatted_script:
         raise ValueError("Script generation failed. Try modifying the input.")
 
+    new_remixed_script = save_remixed_script(state, transcript, formatted_script)
+
+    return {
+        **state,
+        "remixed_script": formatted_script,
+        "remixed_script_id": new_remixed_script.id
+    }
+
+
+def save_remixed_script(state, transcript, formatted_script):
     new_remixed_script = RemixedScript(
         user_id=state["user_id"],
-        video_url=video_url,
+        video_url=state.get("video_url"),
         mode=state["mode"],
         style=state["style"],
         transcript=transcript,
@@ -89,12 +104,66 @@ def remix_script_agent(state):
     db.add(new_remixed_script)
     db.commit()
     db.refresh(new_remixed_script)
+    return new_remixed_script
+
+
+def stream_script_generation(state):
+    """
+    Runs the same steps as the graph but streams the Gemini output.
+    Yields (event, payload): "status" per stage, "token" with incrementally formatted text, then
+    "done" with the id of the persisted Script / RemixedScript, or "error".
+    """
+    remix = choose_entry_path(state) == "right"
+    formatter = IncrementalScriptFormatter()
+
+    if remix:
+        yield "status", {"stage": "transcript"}
+        transcript, err = fetch_transcript(state.get("video_url"))
+        if not transcript:
+            yield "error", {"detail": f"Failed to extract transcript: {err}"}
+            return
+    else:
+        yield "status", {"stage": "search"}
+        state = search_agent(state)
+        yield "status", {"stage": "transcript"}
+        state = past_script_agent(transcript_agent(state))
+        transcript = combine_transcripts(state)
+
+    yield "status", {"stage": "generate"}
+    for chunk in stream_script(transcript, state.get("mode", "Short-form"), state.get("tone", "Casual"), state.get("style", "Casual")):
+        text = formatter.feed(chunk)
+        if text:
+            yield "token", {"text": text}
+    text = formatter.flush()
+    if text:
+        yield "token", {"text": text}
+
+    generated_script = formatter.text
+    if not generated_script or "I can't help with this request." in generated_script:
+        yield "error", {"detail": "Script generation failed. Try modifying the input."}
+        return
 
-    return {
-        **state,
-        "remixed_script": formatted_script,
-        "remixed_script_id": new_remixed_script.id
-    }
+    db = state["db"]
+    if remix:
+        saved = save_remixed_script(state, transcript, generated_script)
+        yield "done", {"remixed_script_id": saved.id}
+        return
+
+    idea = state.get("idea") or state.get("title")
+    new_script = Script(
+        input_title=idea,
+        video_title=f"Script for {idea}",
+        mode=state.get("mode", "Short-form"),
+        style=state.get("style", "Casual"),
+        transcript=transcript,
+        generated_script=generated_script,
+        youtube_links=", ".join(state.get("youtube_links", [])),
+        user_id=state["user_id"]
+    )
+    db.add(new_script)
+    db.commit()
+    db.refresh(new_script)
+    yield "done", {"script_id": new_script.id, "youtube_links": state.get("youtube_links", [])}
 
 
 def entry_agent(state):
@@ -1,10 +1,10 @@
 import os
 from langgraph.graph import StateGraph
 from dotenv import load_dotenv
-from services.youtube_service import fetch_youtube_videos
-from services.engagement_service import calculate_engagement_rate
-from services.trend_service import detect_trending_topics
-from services.title_generator_service import generate_ai_titles
+from service.youtube_service import fetch_youtube_videos
+from service.engagement_service import apply_engagement_metrics
+from service.trend_service import detect_trending_topics
+from service.title_generator_service import generate_ai_titles
 from database.db_connection import SessionLocal  #
 from sqlalchemy.dialects.postgresql import insert
 load_dotenv()
@@ -42,8 +42,9 @@ def engagement_analysis_agent(state):
     if not isinstance(videos, list):  # Ensure videos is a list
         videos = []
 
-    for video in videos:
-        video["engagement_rate"] = calculate_engagement_rate(video)  # ✅ Pass the entire video dictionary
+    # Videos from fetch_youtube_videos already carry their metrics; only score the rest, in one batch.
+    unscored = [video for video in videos if "engagement_rate" not in video]
+    apply_engagement_metrics(unscored, fields=["engagement_rate"])
 
     state["videos"] = videos  # Ensure updated videos are stored back in state
     return state  # Return updated state
@@ -1,7 +1,12 @@
+import asyncio
 from fastapi import FastAPI
 from routes import viral_idea_finder,title_generation,thumbnail,script
 from routes import viral_idea_finder,auth
 from database.db_connection import create_tables
+from service.youtube_client import close_clients
+from service.title_generator_service import warm_up_title_agent
+from service.script_service import model_registry
+from config import TITLE_AGENT_WARMUP_ON_STARTUP, MODEL_PRELOAD
 
 
 app = FastAPI(title="Kreato.AI")
@@ -22,6 +27,22 @@ app.include_router(thumbnail.thumbnail_router, prefix="/thumbnails", tags=["Thum
 app.include_router(script.script_router, prefix="/script", tags=["Script Generation"])
 
 
+@app.on_event("startup")
+async def startup():
+    loop = asyncio.get_running_loop()
+    if TITLE_AGENT_WARMUP_ON_STARTUP:
+        # Build the agent off the event loop so startup is not blocked by it.
+        loop.run_in_executor(None, warm_up_title_agent)
+    if MODEL_PRELOAD:
+        loop.run_in_executor(None, model_registry.preload, MODEL_PRELOAD)
+    model_registry.start_idle_reaper()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_clients()
+
+
 @app.get("/")
 def root():
     return {"message": "Welcome to the Kreato.AI!"}
\ No newline at end of file
@@ -1,16 +1,24 @@
 import os
 from sqlalchemy.orm import Session
-from graph.script_generation_graph import graph
-from database.db_connection import get_db
-from functionality.current_user import get_current_user
+from graph.script_generation_graph import graph, stream_script_generation
+from database.db_connection import get_db, SessionLocal
+from fastapi.responses import StreamingResponse
+from service.utils import sse_event
+from functionality.current_user import get_current_user, get_websocket_user
+from service.transcript_service import transcript_store
+from starlette.websockets import WebSocketState
+from service.speech_stream_service import stream_transcription, AUDIO_FORMATS, TranscriberBusyError
 from database.models import RemixedScript, Script, User
-from fastapi import Depends, UploadFile, File, Form, HTTPException, status, APIRouter
+from fastapi import Depends, UploadFile, File, Form, HTTPException, status, APIRouter, WebSocket, WebSocketDisconnect, Query
+from starlette.concurrency import run_in_threadpool
 from service.script_service import (
     generate_script, 
     transcribe_audio, 
+    save_upload_to_temp,
     get_video_details, 
     fetch_transcript, 
     format_script_response,
+    model_registry,
     # generate_speech,
     # handle_voice_tone_upload
 )
@@ -36,21 +44,75 @@ def get_script(
         return {"error": "Script not found"}
     return {"script": script}
 
+@script_router.get("/models/")
+def get_model_stats(user: User = Depends(get_current_user)):
+    """Load state, load time, memory footprint and usage of the shared transcription models."""
+    return model_registry.stats()
+
+@script_router.get("/transcripts/stats/")
+def get_transcript_stats(user: User = Depends(get_current_user)):
+    """Stored-transcript hits, fetches, coalesced waits and failures since startup."""
+    return transcript_store.stats
+
 @script_router.post("/speech-to-text/")
 def speech_to_text(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user)
     ):
+    file_location = None
     try:
-        file_location = f"temp_{file.filename}"
-        with open(file_location, "wb") as f:
-            f.write(file.file.read())
+        file_location = save_upload_to_temp(file)
         transcription = transcribe_audio(file_location)
-        os.remove(file_location)
         return {"transcription": transcription}
     except Exception as e:
         return {"error": str(e)}
+    finally:
+        if file_location and os.path.exists(file_location):
+            os.remove(file_location)
+
+@script_router.websocket("/speech-to-text/ws/")
+async def speech_to_text_stream(
+    websocket: WebSocket,
+    token: str = Query(None),
+    audio_format: str = Query("pcm", alias="format"),
+    sample_rate: int = Query(16000, ge=8000, le=48000)
+    ):
+    """
+    Streaming speech-to-text over a WebSocket.
+    - Connect with ?token=<jwt>&format=pcm|opus&sample_rate=16000
+    - Send audio as binary frames, then the text frame "eof"
+    - Receives {"type": "partial"|"result"|"final", ...} as Vosk produces them
+    """
+    user = await run_in_threadpool(get_websocket_user, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if audio_format not in AUDIO_FORMATS:
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+        return
+
+    await websocket.accept()
+    try:
+        await stream_transcription(websocket, audio_format, sample_rate)
+        await websocket.close()
+    except WebSocketDisconnect:
+        print(f"Speech stream closed by client (user {user.id})")
+    except TranscriberBusyError as e:
+        await close_with_error(websocket, str(e), status.WS_1013_TRY_AGAIN_LATER)
+    except Exception as e:
+        print(f"Speech stream failed: {e}")
+        await close_with_error(websocket, str(e), status.WS_1011_INTERNAL_ERROR)
+
+async def close_with_error(websocket: WebSocket, detail: str, code: int):
+    """Reports an error and closes, unless the client has already gone away."""
+    if websocket.client_state != WebSocketState.CONNECTED:
+        return
+    try:
+        await websocket.send_json({"type": "error", "detail": detail})
+        await websocket.close(code=code)
+    except Exception as e:
+        print(f"Could not close speech stream: {e}")
 
 # @script_router.post("/text-to-speech/")
 # async def text_to_speech_endpoint(
@@ -140,3 +202,39 @@ def generate_script_multiagent_api(
 
     except Exception as e:
         return {"error": str(e)}
+
+@script_router.post("/generate-script-multiagent/stream/")
+def generate_script_multiagent_stream_api(
+    idea: str = Form(None),
+    title: str = Form(None),
+    tone: str = Form("Casual"),
+    mode: str = Form("Short-form"),
+    style: str = Form("Casual"),
+    remix: bool = Form(False),
+    video_url: str = Form(None),
+    user: User = Depends(get_current_user)
+):
+    """Streaming variant of /generate-script-multiagent/: status, token and done (or error) SSE events."""
+    def events():
+        # The request-scoped session may be closed before streaming finishes, so use a dedicated one.
+        db = SessionLocal()
+        state = {
+            "idea": idea,
+            "title": title,
+            "tone": tone,
+            "mode": mode,
+            "style": style,
+            "remix": remix,
+            "video_url": video_url,
+            "db": db,
+            "user_id": user.id
+        }
+        try:
+            for event, payload in stream_script_generation(state):
+                yield sse_event(event, payload)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            db.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
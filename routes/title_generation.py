@@ -1,19 +1,66 @@
+from typing import List, Optional
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from config import TITLE_BATCH_MAX_TOPICS
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from service.utils import sse_event
 from database.db_connection import get_db
 from database.models import GeneratedTitle, User
 from functionality.current_user import get_current_user  
-from service.title_generator_service import generate_ai_titles
+from service.title_generator_service import generate_ai_titles, generate_ai_titles_batch, stream_ai_titles, warm_up_title_agent
+from service.title_cache_service import title_cache
 
 router = APIRouter()
 
+class TitleBatchRequest(BaseModel):
+    topics: List[str] = Field(..., min_length=1, max_length=TITLE_BATCH_MAX_TOPICS, description="Topics or YouTube URLs")
+    use_history: bool = False
+    use_cache: bool = True
+    mode: Optional[str] = Field(None, pattern="^(agent|direct)$", description="agent or direct; defaults to TITLE_GENERATION_MODE")
+
 @router.post("/generate_titles/")
 def get_titles(
     topic: str,
+    use_history: bool = Query(True, description="Include your previous title requests as context; false for stateless generation"),
+    use_cache: bool = Query(True, description="Reuse titles generated earlier for the same or a very similar topic"),
+    mode: str = Query(None, description="agent: LangChain agent loop; direct: one LLM call with JSON output. Defaults to TITLE_GENERATION_MODE", pattern="^(agent|direct)$"),
     user: User = Depends(get_current_user), 
     db: Session = Depends(get_db),
 ):
-    return generate_ai_titles(topic, user.id, db)  
+    return generate_ai_titles(topic, user.id, db, use_history, use_cache, mode)  
+
+@router.post("/generate_titles/stream/")
+def stream_titles(
+    topic: str,
+    use_cache: bool = Query(True, description="Reuse titles generated earlier for the same or a very similar topic"),
+    user: User = Depends(get_current_user),
+):
+    """Streams generated titles over SSE: token, title, then done (or error) events."""
+    events = (sse_event(event, payload) for event, payload in stream_ai_titles(topic, user.id, use_cache))
+    return StreamingResponse(events, media_type="text/event-stream")
+
+@router.post("/generate_titles/batch")
+async def get_titles_batch(
+    request: TitleBatchRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Generates titles for many topics at once; each item carries its titles or its error."""
+    return await generate_ai_titles_batch(
+        request.topics, user.id, db, request.use_history, request.use_cache, mode=request.mode
+    )
+
+@router.get("/ready/")
+def title_agent_readiness():
+    """Readiness probe: builds the title agent if needed; 503 until it can be built."""
+    status = warm_up_title_agent()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@router.get("/cache/stats/")
+def get_title_cache_stats(user: User = Depends(get_current_user)):
+    """Hit rate, similarity threshold and best-match similarity distribution of the title cache."""
+    return title_cache.stats()
 
 @router.get("/user_titles/")
 def get_user_titles(
@@ -1,12 +1,21 @@
+import json
+import httpx
+import asyncio
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from database.db_connection import get_db
+from fastapi.responses import StreamingResponse
+from database.db_connection import get_db, SessionLocal
 from database.models import Video, Channel
 from database.models import User, UserSavedVideo
-from functionality.current_user import get_current_user
-from fastapi import APIRouter, Depends, Query, HTTPException
-from service.youtube_service import fetch_youtube_videos, fetch_video_by_id
-from service.engagement_service import calculate_engagement_rate, calculate_view_to_subscriber_ratio, calculate_view_velocity
+from service.quota_service import quota_manager, QuotaExceededError
+from functionality.current_user import get_current_user, get_optional_current_user
+from fastapi import APIRouter, Depends, Query, HTTPException, BackgroundTasks
+from service.utils import sse_event
+from service.response_cache import response_cache
+from service.trend_window_service import top_rising_keywords
+from service.trend_backfill_service import run_backfill_job, load_checkpoint, checkpoint_to_dict, backfill_lock
+from service.youtube_service import parse_upload_date, fetch_video_by_id, fetch_youtube_videos_async, iter_youtube_video_pages, find_stored_videos
+from service.engagement_service import run_rescore_job, rescore_lock, calculate_engagement_rate, calculate_view_to_subscriber_ratio, calculate_view_velocity
 
 router = APIRouter()
 saved_videos = []
@@ -17,20 +26,121 @@ class VideoSaveRequest(BaseModel):
     description: str
 
 @router.get("/search/")
-def get_videos(
+async def get_videos(
     query: str, 
     max_results: int = Query(10, description="Number of results to return", ge=1, le=50),
     duration_category: str = Query(None, description="Filter by duration: short, medium, long"),
     min_views: int = Query(None, description="Minimum views required"),
     min_subscribers: int = Query(None, description="Minimum subscriber count"),
     upload_date: str = Query(None, description="Filter by upload date: today, this_week, this_month, this_year"),
+    mode: str = Query("live", description="live: query the YouTube API; local: full-text search over stored videos", pattern="^(live|local)$"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_optional_current_user)
+):
+    if mode == "local":
+        # Spends no quota; each result carries is_fresh so callers can decide whether to refresh.
+        return await asyncio.to_thread(find_stored_videos, query, max_results, db, min_views, min_subscribers)
+
+    return await fetch_youtube_videos_async(
+        query, max_results, duration_category, min_views, min_subscribers, upload_date,
+        db=db, user_id=user.id if user else None
+    )
+
+@router.get("/search/stream/")
+async def stream_videos(
+    query: str,
+    total_results: int = Query(200, description="Number of search results to walk through", ge=1, le=500),
+    duration_category: str = Query(None, description="Filter by duration: short, medium, long"),
+    upload_date: str = Query(None, description="Filter by upload date: today, this_week, this_month, this_year"),
+    min_views: int = Query(None, description="Minimum views required"),
+    min_subscribers: int = Query(None, description="Minimum subscriber count"),
+    format: str = Query("ndjson", description="Stream format: ndjson or sse", pattern="^(ndjson|sse)$"),
+    user: User = Depends(get_optional_current_user)
+):
+    """Streams enriched videos page by page (ranked within each page) as NDJSON lines or SSE events."""
+    user_id = user.id if user else None
+
+    def encode(event, payload):
+        return sse_event(event, payload) if format == "sse" else json.dumps(payload, default=str) + "\n"
+
+    async def event_stream():
+        # The request-scoped session may be closed before streaming finishes, so use a dedicated one.
+        db = SessionLocal()
+        sent = 0
+        try:
+            page_number = 0
+            async for page in iter_youtube_video_pages(query, total_results, duration_category, upload_date, db, user_id, min_views, min_subscribers):
+                page_number += 1
+                for rank, video in enumerate(page, start=1):
+                    sent += 1
+                    yield encode("video", {**video, "page": page_number, "page_rank": rank})
+            yield encode("done", {"event": "done", "total": sent})
+        except (QuotaExceededError, ValueError, httpx.HTTPError) as e:
+            # Headers are already sent, so quota, missing-key and network failures end the stream with an error record.
+            yield encode("error", {"event": "error", "detail": str(e), "total": sent})
+        finally:
+            db.close()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type)
+
+@router.get("/trends/")
+def get_rising_trends(
+    limit: int = Query(20, description="Number of rising keywords to return", ge=1, le=100),
     db: Session = Depends(get_db)
 ):
-    return fetch_youtube_videos(query, max_results, duration_category, min_views, min_subscribers, upload_date)
+    """Keywords rising fastest over the recent window compared with their 7-day baseline."""
+    return {"trends": top_rising_keywords(limit, db)}
+
+@router.post("/trends/backfill/")
+def start_trend_backfill(
+    background_tasks: BackgroundTasks,
+    restart: bool = Query(False, description="Discard an unfinished checkpoint and rebuild from scratch"),
+    user: User = Depends(get_current_user)
+):
+    """Admin only: rebuilds trending_topics from every stored video in the background, resuming from the last checkpoint."""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if backfill_lock.locked():
+        raise HTTPException(status_code=409, detail="Trend backfill already running")
+
+    background_tasks.add_task(run_backfill_job, restart)
+    return {"message": "Trend backfill started", "restart": restart}
+
+@router.get("/trends/backfill/")
+def get_trend_backfill_status(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Progress of the current or last trend backfill."""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return checkpoint_to_dict(load_checkpoint(db))
+
+@router.post("/videos/rescore/")
+def start_video_rescore(background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
+    """Admin only: recomputes engagement_rate and view_to_subscriber_ratio for every stored video in the background."""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if rescore_lock.locked():
+        raise HTTPException(status_code=409, detail="Video rescore already running")
+
+    background_tasks.add_task(run_rescore_job)
+    return {"message": "Video rescore started"}
+
+@router.get("/cache/stats/")
+def get_cache_stats(user: User = Depends(get_current_user)):
+    """Hit/miss counters and TTLs of the YouTube response cache."""
+    return response_cache.stats()
+
+@router.get("/quota/")
+def get_quota_usage(user: User = Depends(get_current_user)):
+    """Today's YouTube quota spend and remaining budget. Admins see every user's spend."""
+    return {
+        "remaining": quota_manager.remaining(user.id),
+        "usage": quota_manager.usage(None if user.role == "admin" else user.id),
+    }
 
 @router.get("/video/{videoid}")
-def get_video_details(videoid: str):
-    video_data = fetch_video_by_id(videoid)
+def get_video_details(videoid: str, db: Session = Depends(get_db), user: User = Depends(get_optional_current_user)):
+    video_data = fetch_video_by_id(videoid, user.id if user else None, db)
     return video_data
 
 @router.post("/video/save/{video_id}")
@@ -42,7 +152,7 @@ def save_video(
     """API endpoint to save a video by video ID."""
     print(f"Saving video {video_id} for user {user.id}")
 
-    video_details = fetch_video_by_id(video_id)
+    video_details = fetch_video_by_id(video_id, user.id, db)
 
     if "error" in video_details:
         raise HTTPException(status_code=404, detail="Video not found")
@@ -76,7 +186,7 @@ def save_video(
             title=video_details["title"],
             channel_id=video_details["channel_id"],
             channel_name=video_details["channel_name"],
-            upload_date=video_details["upload_date"],
+            upload_date=parse_upload_date(video_details["upload_date"]),
             thumbnail=video_details["thumbnail"],
             video_url=video_details["video_url"],
             views=video_details["views"],
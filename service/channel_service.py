@@ -0,0 +1,137 @@
+import asyncio
+from sqlalchemy.orm import Session
+from database.models import Channel
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from config import CHANNEL_CACHE_TTL_HOURS
+from service.quota_service import QuotaExceededError
+from service.youtube_client import youtube_get, youtube_get_async
+
+CHANNEL_BATCH_SIZE = 50  # Maximum number of IDs accepted by channels.list
+
+def chunk_ids(ids, size=CHANNEL_BATCH_SIZE):
+    """Split a list of IDs into lists of at most `size` items."""
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+def parse_channel_item(item):
+    """Convert a channels.list item into the columns stored on Channel."""
+    snippet = item.get("snippet", {})
+    stats = item.get("statistics", {})
+    return {
+        "channel_id": item["id"],
+        "name": snippet.get("title", ""),
+        "country": snippet.get("country"),
+        "total_subscribers": int(stats.get("subscriberCount", 0)),
+        "total_videos": int(stats.get("videoCount", 0)),
+    }
+
+def channel_params(chunk):
+    return {"part": "snippet,statistics", "id": ",".join(chunk)}
+
+def fetch_channel_statistics(channel_ids, user_id=None):
+    """Fetch snippet and statistics for the given channels, 50 IDs per request."""
+    channels = {}
+    for chunk in chunk_ids(channel_ids):
+        response = youtube_get("channels", channel_params(chunk), user_id=user_id)
+        for item in response.get("items", []):
+            channels[item["id"]] = parse_channel_item(item)
+    return channels
+
+async def fetch_channel_statistics_async(channel_ids, user_id=None):
+    """Async variant of fetch_channel_statistics; all chunks are requested concurrently."""
+    responses = await asyncio.gather(
+        *(youtube_get_async("channels", channel_params(chunk), user_id=user_id) for chunk in chunk_ids(channel_ids))
+    )
+    channels = {}
+    for response in responses:
+        for item in response.get("items", []):
+            channels[item["id"]] = parse_channel_item(item)
+    return channels
+
+def load_cached_channels(channel_ids, db: Session, ttl_hours: int = CHANNEL_CACHE_TTL_HOURS):
+    """
+    Reads the requested channels from the database.
+    Returns ({channel_id: subscribers} for fresh rows, {channel_id: Channel} for every row found).
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    rows = {
+        channel.channel_id: channel
+        for channel in db.query(Channel).filter(Channel.channel_id.in_(channel_ids)).all()
+    }
+    subscribers = {
+        channel_id: channel.total_subscribers or 0
+        for channel_id, channel in rows.items()
+        if channel.updated_at and channel.updated_at >= cutoff
+    }
+    return subscribers, rows
+
+def stale_subscribers(rows):
+    """Subscriber counts from cached rows regardless of age, used when the quota budget is spent."""
+    return {channel_id: channel.total_subscribers or 0 for channel_id, channel in rows.items()}
+
+def store_channels(fetched, rows, db: Session):
+    """Inserts or refreshes Channel rows for freshly fetched statistics."""
+    now = datetime.utcnow()
+    for channel_id, data in fetched.items():
+        channel = rows.get(channel_id)
+        if channel is None:
+            channel = Channel(channel_id=channel_id)
+            db.add(channel)
+        channel.name = data["name"]
+        channel.country = data["country"]
+        channel.total_subscribers = data["total_subscribers"]
+        channel.total_videos = data["total_videos"]
+        channel.updated_at = now
+
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Failed to cache channel statistics: {e}")
+
+def resolve_channel_subscribers(channel_ids, db: Session, ttl_hours: int = CHANNEL_CACHE_TTL_HOURS, user_id=None):
+    """
+    Returns {channel_id: subscriber_count} for every requested channel.
+    - Channel rows refreshed within `ttl_hours` are served from the database.
+    - Missing or stale channels are fetched in batches and written back to `channels`.
+    - If the quota budget is spent, stale rows are served instead.
+    """
+    unique_ids = list(dict.fromkeys(cid for cid in channel_ids if cid))
+    if not unique_ids:
+        return {}
+
+    subscribers, rows = load_cached_channels(unique_ids, db, ttl_hours)
+    stale_ids = [cid for cid in unique_ids if cid not in subscribers]
+    if not stale_ids:
+        return subscribers
+
+    try:
+        fetched = fetch_channel_statistics(stale_ids, user_id)
+    except QuotaExceededError as e:
+        print(f"{e} Serving cached channel statistics.")
+        return stale_subscribers(rows)
+
+    store_channels(fetched, rows, db)
+    subscribers.update({channel_id: data["total_subscribers"] for channel_id, data in fetched.items()})
+    return subscribers
+
+async def resolve_channel_subscribers_async(channel_ids, db: Session, ttl_hours: int = CHANNEL_CACHE_TTL_HOURS, user_id=None):
+    """Async variant of resolve_channel_subscribers; database work runs in a worker thread."""
+    unique_ids = list(dict.fromkeys(cid for cid in channel_ids if cid))
+    if not unique_ids:
+        return {}
+
+    subscribers, rows = await asyncio.to_thread(load_cached_channels, unique_ids, db, ttl_hours)
+    stale_ids = [cid for cid in unique_ids if cid not in subscribers]
+    if not stale_ids:
+        return subscribers
+
+    try:
+        fetched = await fetch_channel_statistics_async(stale_ids, user_id)
+    except QuotaExceededError as e:
+        print(f"{e} Serving cached channel statistics.")
+        return stale_subscribers(rows)
+
+    await asyncio.to_thread(store_channels, fetched, rows, db)
+    subscribers.update({channel_id: data["total_subscribers"] for channel_id, data in fetched.items()})
+    return subscribers
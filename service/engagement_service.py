@@ -1,36 +1,185 @@
+import threading
+import numpy as np
+from database.models import Video
+from database.db_connection import SessionLocal
+from sqlalchemy import select, update
 from datetime import datetime, timezone
 
+SECONDS_PER_DAY = 24 * 60 * 60
+
+rescore_lock = threading.Lock()
+
+def to_epoch_seconds(upload_dates):
+    """
+    Converts upload dates to POSIX seconds in one vectorized parse.
+    Accepts ISO 8601 strings (e.g. "2024-05-01T12:00:00Z") and datetimes (naive values are UTC).
+    Missing or unparsable values become NaN.
+    """
+    prefixes = []
+    for value in upload_dates:
+        if isinstance(value, datetime):
+            if value.tzinfo:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            prefixes.append(value.isoformat()[:19])
+        elif isinstance(value, str) and value:
+            if value[19:] not in ("", "Z"):
+                # Offsets or fractional seconds: normalize through the slow path.
+                try:
+                    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                    value = parsed.astimezone(timezone.utc).replace(tzinfo=None).isoformat() if parsed.tzinfo else parsed.isoformat()
+                except ValueError:
+                    value = "NaT"
+            prefixes.append(value[:19])
+        else:
+            prefixes.append("NaT")
+
+    try:
+        stamps = np.array(prefixes, dtype="datetime64[s]")
+    except ValueError:
+        stamps = np.array([safe_datetime64(prefix) for prefix in prefixes], dtype="datetime64[s]")
+
+    seconds = stamps.astype("int64").astype(np.float64)
+    seconds[np.isnat(stamps)] = np.nan
+    return seconds
+
+def safe_datetime64(value):
+    try:
+        return np.datetime64(value, "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+def compute_engagement_metrics(views, likes, comments, subscribers, upload_timestamps, now=None):
+    """
+    Computes every engagement metric for a batch of videos in one pass.
+    - Inputs are equal-length array-likes; `upload_timestamps` holds POSIX seconds (NaN when unknown).
+    - Divisions by zero yield 0, matching the per-video functions.
+    Returns a dict of float64 arrays rounded to 2 decimals.
+    """
+    views = np.asarray(views, dtype=np.float64)
+    likes = np.asarray(likes, dtype=np.float64)
+    comments = np.asarray(comments, dtype=np.float64)
+    subscribers = np.asarray(subscribers, dtype=np.float64)
+    upload_timestamps = np.asarray(upload_timestamps, dtype=np.float64)
+    now = now if now is not None else datetime.now(timezone.utc).timestamp()
+
+    has_views = views > 0
+    has_subscribers = subscribers > 0
+    has_upload = ~np.isnan(upload_timestamps)
+
+    days_since_upload = np.maximum(np.floor((now - np.where(has_upload, upload_timestamps, now)) / SECONDS_PER_DAY), 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(has_subscribers, views / np.where(has_subscribers, subscribers, 1), 0.0)
+        velocity = np.where(has_upload, views / days_since_upload, 0.0)
+        safe_views = np.where(has_views, views, 1)
+        engagement = np.where(has_views, (likes + comments) / safe_views * 100, 0.0)
+        ctr = np.where(has_views, likes / safe_views * 100, 0.0)
+
+    return {
+        "view_to_subscriber_ratio": np.round(ratio, 2),
+        "view_velocity": np.round(velocity, 2),
+        "engagement_rate": np.round(engagement, 2),
+        "ctr": np.round(ctr, 2),
+    }
+
+def safe_int(value):
+    """int(value), or 0 when it is missing or not numeric, like the per-video functions."""
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+def metrics_for_videos(videos, now=None):
+    """Runs compute_engagement_metrics over a list of video dicts; missing or non-numeric counts become 0."""
+    return compute_engagement_metrics(
+        [safe_int(video.get("views")) for video in videos],
+        [safe_int(video.get("likes")) for video in videos],
+        [safe_int(video.get("comments")) for video in videos],
+        [safe_int(video.get("subscribers")) for video in videos],
+        to_epoch_seconds([video.get("upload_date") for video in videos]),
+        now,
+    )
+
+def apply_engagement_metrics(videos, now=None, fields=None):
+    """Writes the batch metrics (optionally only `fields`) back onto each video dict."""
+    if not videos:
+        return videos
+    metrics = metrics_for_videos(videos, now)
+    for name in fields or metrics:
+        for video, value in zip(videos, metrics[name].tolist()):
+            video[name] = value
+    return videos
+
 def calculate_view_to_subscriber_ratio(views, subscribers):
     """Calculate View-to-Subscriber Ratio."""
     try:
         views = int(views) if views is not None else 0
         subscribers = int(subscribers) if subscribers is not None else 0
-        return round(views / subscribers, 2) if subscribers > 0 else 0  # Avoid division by zero
+        return float(compute_engagement_metrics([views], [0], [0], [subscribers], [np.nan])["view_to_subscriber_ratio"][0])
     except (ValueError, TypeError):
-        return 0  
+        return 0
 
 def calculate_view_velocity(video):
     """Estimate how fast a video is gaining views (views per day)."""
     try:
         views = int(video.get("views", 0))
-        upload_date_str = video.get("upload_date", "")
-        
-        if not upload_date_str:
-            return 0  
-        
-        upload_date = datetime.fromisoformat(upload_date_str.replace("Z", "+00:00"))
-        days_since_upload = max((datetime.now(timezone.utc) - upload_date).days, 1)  # Avoid division by zero
-        return round(views / days_since_upload, 2)
+        upload_timestamps = to_epoch_seconds([video.get("upload_date", "")])
+        return float(compute_engagement_metrics([views], [0], [0], [0], upload_timestamps)["view_velocity"][0])
     except (ValueError, TypeError):
-        return 0  
+        return 0
 
 def calculate_engagement_rate(video):
     """Calculate the engagement rate (Likes + Comments) / Views * 100."""
     try:
         likes = int(video.get("likes", 0))
         comments = int(video.get("comments", 0))
-        views = int(video.get("views", 1))  
-        
-        return round(((likes + comments) / views) * 100, 2) if views > 0 else 0
+        views = int(video.get("views", 1))
+
+        return float(compute_engagement_metrics([views], [likes], [comments], [0], [np.nan])["engagement_rate"][0])
     except (ValueError, TypeError):
-        return 0  
+        return 0
+
+def rescore_stored_videos(db, chunk_size: int = 5000):
+    """
+    Recomputes engagement_rate and view_to_subscriber_ratio for every stored video in chunks.
+    view_velocity is left alone because it is maintained from stats snapshots.
+    Returns the number of rescored rows.
+    """
+    columns = select(Video.video_id, Video.views, Video.likes, Video.comments, Video.subscribers)
+    result = db.execute(columns.execution_options(yield_per=chunk_size))
+    rescored = 0
+
+    for rows in result.partitions():
+        video_ids, views, likes, comments, subscribers = zip(*rows)
+        metrics = compute_engagement_metrics(
+            [value or 0 for value in views],
+            [value or 0 for value in likes],
+            [value or 0 for value in comments],
+            [value or 0 for value in subscribers],
+            np.full(len(video_ids), np.nan),
+        )
+        db.execute(update(Video), [
+            {"video_id": video_id, "engagement_rate": engagement, "view_to_subscriber_ratio": ratio}
+            for video_id, engagement, ratio in zip(
+                video_ids, metrics["engagement_rate"].tolist(), metrics["view_to_subscriber_ratio"].tolist()
+            )
+        ])
+        rescored += len(video_ids)
+
+    db.commit()
+    return rescored
+
+def run_rescore_job(chunk_size: int = 5000):
+    """Background entry point for rescore_stored_videos: one run per process at a time, on its own session."""
+    if not rescore_lock.acquire(blocking=False):
+        print("Video rescore already running in this process")
+        return
+    db = SessionLocal()
+    try:
+        print(f"Rescored {rescore_stored_videos(db, chunk_size)} stored videos")
+    except Exception as e:
+        db.rollback()
+        print(f"Video rescore failed: {e}")
+    finally:
+        db.close()
+        rescore_lock.release()
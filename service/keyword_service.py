@@ -0,0 +1,98 @@
+import numpy as np
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from database.db_connection import dialect_insert
+from service.utils import build_term_counts, extract_keywords_batch
+from database.models import Video, KeywordDocumentFrequency, KeywordCorpus
+
+CORPUS_ROW_ID = 1
+
+def claim_unindexed_videos(video_ids, db: Session):
+    """Marks videos as counted in the corpus statistics; returns only the IDs this call claimed."""
+    if not video_ids:
+        return set()
+    claimed = db.execute(
+        update(Video)
+        .where(Video.video_id.in_(video_ids), Video.keywords_indexed_at.is_(None))
+        .values(keywords_indexed_at=datetime.utcnow())
+        .returning(Video.video_id)
+    ).scalars().all()
+    return set(claimed)
+
+def update_document_frequencies(videos, db: Session, counts=None, vocabulary=None):
+    """
+    Adds stored videos that are not yet counted to the persisted document-frequency statistics.
+    Each video is counted once, even when it shows up in many searches or concurrent requests.
+    `counts` / `vocabulary` from build_term_counts over the `videos` titles are reused when given;
+    only the rows of newly claimed videos are counted.
+    Returns the number of newly counted videos.
+    """
+    claimed = claim_unindexed_videos(list({video["video_id"] for video in videos}), db)
+    rows = [
+        row for video_id, row in {video["video_id"]: row for row, video in enumerate(videos)}.items()
+        if video_id in claimed
+    ]
+    if not rows:
+        db.commit()
+        return 0
+
+    if vocabulary is None:
+        counts, vocabulary = build_term_counts([video["title"] for video in videos])
+    # Terms only seen in already-counted titles get 0 here and are skipped.
+    frequencies = np.bincount(counts[rows].indices, minlength=len(vocabulary)).tolist() if counts is not None else []
+    frequency_rows = [
+        {"term": term, "document_count": count}
+        for term, count in zip(vocabulary.tolist(), frequencies)
+        if count
+    ]
+    if frequency_rows:
+        frequency_stmt = dialect_insert(db, KeywordDocumentFrequency).values(frequency_rows)
+        db.execute(frequency_stmt.on_conflict_do_update(
+            index_elements=["term"],
+            set_={"document_count": KeywordDocumentFrequency.document_count + frequency_stmt.excluded.document_count}
+        ))
+
+    corpus_stmt = dialect_insert(db, KeywordCorpus).values(id=CORPUS_ROW_ID, document_count=len(rows))
+    db.execute(corpus_stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"document_count": KeywordCorpus.document_count + corpus_stmt.excluded.document_count}
+    ))
+    db.commit()
+    return len(rows)
+
+def load_corpus_statistics(terms, db: Session):
+    """Returns ({term: document_count} for the given terms, total documents in the corpus)."""
+    corpus = db.get(KeywordCorpus, CORPUS_ROW_ID)
+    if not corpus or not terms:
+        return {}, corpus.document_count if corpus else 0
+
+    rows = db.query(KeywordDocumentFrequency.term, KeywordDocumentFrequency.document_count).filter(
+        KeywordDocumentFrequency.term.in_(terms)
+    ).all()
+    return dict(rows), corpus.document_count
+
+def extract_corpus_keywords(videos, db: Session, top_k: int = 5):
+    """
+    Extracts keywords for every video title in one batch, with IDF taken from the whole `videos` corpus.
+    Falls back to in-batch IDF if the corpus statistics cannot be read or updated.
+    The titles are tokenized once; the same count matrix feeds the statistics update and the scoring.
+    Returns one keyword list per video, in order.
+    """
+    titles = [video["title"] for video in videos]
+    if not titles:
+        return []
+
+    counts, vocabulary = build_term_counts(titles)
+    try:
+        update_document_frequencies(videos, db, counts, vocabulary)
+        frequencies, total_documents = load_corpus_statistics(vocabulary.tolist(), db)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Corpus keyword statistics unavailable, using batch IDF: {e}")
+        return extract_keywords_batch(titles, top_k=top_k, counts=counts, vocabulary=vocabulary)
+
+    if not total_documents:
+        return extract_keywords_batch(titles, top_k=top_k, counts=counts, vocabulary=vocabulary)
+    return extract_keywords_batch(titles, frequencies, total_documents, top_k, counts, vocabulary)
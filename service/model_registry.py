@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc), or None where unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class ModelEntry:
+    def __init__(self, name: str, loader, concurrency: int):
+        self.name = name
+        self.loader = loader
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.load_lock = threading.Lock()
+        self.model = None
+        self.in_use = 0
+        self.loads = 0
+        self.uses = 0
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.loaded_at = None
+        self.last_used = None
+
+class ModelRegistry:
+    """
+    Process-wide registry of heavy models (Whisper, Vosk).
+    - Each model is loaded once, on first use or by `preload`, and shared across requests.
+    - `use` hands the model out to at most `concurrency` callers at a time.
+    - Load time and the RSS growth caused by loading are recorded for `stats`.
+    - Models idle longer than `idle_seconds` can be evicted (`evict_idle`, or the background reaper).
+    """
+
+    def __init__(self, idle_seconds: int = 0):
+        self.idle_seconds = idle_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def register(self, name: str, loader, concurrency: int = 1):
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = ModelEntry(name, loader, concurrency)
+
+    def _entry(self, name: str) -> ModelEntry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model '{name}' is not registered")
+        return entry
+
+    def _ensure_loaded(self, entry: ModelEntry):
+        # Per-model lock: loading one model does not block the others.
+        with entry.load_lock:
+            if entry.model is not None:
+                return entry.model
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            entry.model = entry.loader()
+            entry.load_seconds = round(time.perf_counter() - started, 3)
+            rss_after = current_rss_bytes()
+            entry.memory_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            entry.loaded_at = time.time()
+            entry.loads += 1
+            print(f"Loaded model {entry.name} in {entry.load_seconds}s")
+            return entry.model
+
+    def acquire(self, name: str, blocking: bool = True):
+        """
+        Takes a slot and returns the loaded model; pair with `release`.
+        With `blocking=False`, returns None instead of waiting when every slot is taken.
+        """
+        entry = self._entry(name)
+        if not entry.slots.acquire(blocking=blocking):
+            return None
+        try:
+            model = self._ensure_loaded(entry)
+        except Exception:
+            entry.slots.release()
+            raise
+        with self._lock:
+            entry.in_use += 1
+            entry.uses += 1
+        return model
+
+    def release(self, name: str):
+        entry = self._entry(name)
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.time()
+        entry.slots.release()
+
+    @contextmanager
+    def use(self, name: str):
+        """Borrows a loaded model; blocks while `concurrency` callers already hold it."""
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def preload(self, names):
+        for name in names:
+            try:
+                self._ensure_loaded(self._entry(name))
+            except Exception as e:
+                print(f"Could not preload model {name}: {e}")
+
+    def evict(self, name: str) -> bool:
+        """Drops a model that is not in use. Returns True if it was unloaded."""
+        with self._lock:
+            entry = self._entry(name)
+            if entry.model is None or entry.in_use:
+                return False
+            entry.model = None
+        print(f"Evicted model {name}")
+        return True
+
+    def evict_idle(self, idle_seconds: int = None):
+        idle_seconds = idle_seconds if idle_seconds is not None else self.idle_seconds
+        now = time.time()
+        evicted = []
+        for name, entry in list(self._entries.items()):
+            last_active = entry.last_used or entry.loaded_at
+            if entry.model is not None and last_active and now - last_active >= idle_seconds:
+                if self.evict(name):
+                    evicted.append(name)
+        return evicted
+
+    def start_idle_reaper(self, interval_seconds: int = 60):
+        """Starts a daemon thread that evicts idle models; no-op when idle eviction is disabled."""
+        if self.idle_seconds <= 0 or self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(interval_seconds)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="model-registry-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "loaded": entry.model is not None,
+                    "in_use": entry.in_use,
+                    "concurrency": entry.concurrency,
+                    "loads": entry.loads,
+                    "uses": entry.uses,
+                    "load_seconds": entry.load_seconds,
+                    "memory_mb": round(entry.memory_bytes / 2 ** 20, 1) if entry.memory_bytes is not None else None,
+                    "idle_seconds": round(time.time() - entry.last_used, 1) if entry.last_used else None,
+                }
+                for name, entry in self._entries.items()
+            }
@@ -0,0 +1,131 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from database.models import YoutubeQuotaLedger
+from database.db_connection import SessionLocal, dialect_insert
+from config import YOUTUBE_DAILY_QUOTA, YOUTUBE_USER_DAILY_QUOTA
+
+# Quota units charged by the YouTube Data API v3 for each endpoint this project calls.
+ENDPOINT_COSTS = {
+    "search": 100,
+    "videos": 1,
+    "channels": 1,
+}
+
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+ANONYMOUS_USER = "anonymous"
+ALL = "*"
+
+class QuotaExceededError(Exception):
+    """Raised when a call would overspend the global or per-user YouTube quota budget."""
+
+    def __init__(self, endpoint, user_key, scope, available):
+        self.endpoint = endpoint
+        self.user_key = user_key
+        self.scope = scope
+        self.available = available
+        super().__init__(
+            f"YouTube quota budget exhausted ({scope}): {endpoint} costs "
+            f"{ENDPOINT_COSTS.get(endpoint, 1)} units, {int(available)} available."
+        )
+
+def quota_day():
+    """YouTube's quota day: it resets at midnight Pacific time."""
+    return datetime.now(QUOTA_TIMEZONE).date()
+
+class QuotaManager:
+    """
+    Tracks YouTube Data API spend in the shared `youtube_quota_ledger` table, so every worker sees one budget.
+    - One row per (Pacific day, user, endpoint), plus "*" rows holding the user total and the project total.
+    - `charge` checks and increments both totals in one transaction with conditional upserts,
+      so concurrent workers cannot overspend the daily allowance.
+    """
+
+    def __init__(self, global_capacity: int, user_capacity: int):
+        self.global_capacity = global_capacity
+        self.user_capacity = user_capacity
+
+    def _increment(self, db, day, user_key, endpoint, cost, capacity=None):
+        """Adds `cost` to a ledger row; with `capacity`, only if the total stays within it. Returns the new total or None."""
+        stmt = dialect_insert(db, YoutubeQuotaLedger).values(
+            quota_day=day, user_key=user_key, endpoint=endpoint, units=cost, calls=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["quota_day", "user_key", "endpoint"],
+            set_={"units": YoutubeQuotaLedger.units + cost, "calls": YoutubeQuotaLedger.calls + 1},
+            where=(YoutubeQuotaLedger.units + cost <= capacity) if capacity is not None else None,
+        ).returning(YoutubeQuotaLedger.units)
+        return db.execute(stmt).scalar()
+
+    def _spent(self, db, day, user_key):
+        return db.execute(
+            select(YoutubeQuotaLedger.units).where(
+                YoutubeQuotaLedger.quota_day == day,
+                YoutubeQuotaLedger.user_key == user_key,
+                YoutubeQuotaLedger.endpoint == ALL,
+            )
+        ).scalar() or 0
+
+    def charge(self, endpoint: str, user_id=None):
+        """Charges one call to `endpoint` to the user, raising QuotaExceededError if either budget is short."""
+        user_key = str(user_id) if user_id is not None else ANONYMOUS_USER
+        cost = ENDPOINT_COSTS.get(endpoint, 1)
+        day = quota_day()
+
+        db = SessionLocal()
+        try:
+            # The row locks taken by the global increment serialize concurrent charges until commit.
+            if cost > self.global_capacity or self._increment(db, day, ALL, ALL, cost, self.global_capacity) is None:
+                available = self.global_capacity - self._spent(db, day, ALL)
+                db.rollback()
+                raise QuotaExceededError(endpoint, user_key, "global", available)
+            if cost > self.user_capacity or self._increment(db, day, user_key, ALL, cost, self.user_capacity) is None:
+                available = self.user_capacity - self._spent(db, day, user_key)
+                db.rollback()
+                raise QuotaExceededError(endpoint, user_key, "user", available)
+            self._increment(db, day, user_key, endpoint, cost)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Quota ledger update failed, call not charged: {e}")
+        finally:
+            db.close()
+
+    def remaining(self, user_id=None) -> dict:
+        user_key = str(user_id) if user_id is not None else ANONYMOUS_USER
+        day = quota_day()
+        db = SessionLocal()
+        try:
+            return {
+                "global": max(0, self.global_capacity - self._spent(db, day, ALL)),
+                "user": max(0, self.user_capacity - self._spent(db, day, user_key)),
+            }
+        finally:
+            db.close()
+
+    def can_afford(self, endpoint: str, user_id=None) -> bool:
+        """Checks both budgets without charging anything."""
+        cost = ENDPOINT_COSTS.get(endpoint, 1)
+        remaining = self.remaining(user_id)
+        return remaining["global"] >= cost and remaining["user"] >= cost
+
+    def usage(self, user_id=None) -> dict:
+        """Today's ledger entries for one user, or for every user when `user_id` is None."""
+        db = SessionLocal()
+        try:
+            query = db.query(YoutubeQuotaLedger).filter(
+                YoutubeQuotaLedger.quota_day == quota_day(),
+                YoutubeQuotaLedger.user_key != ALL,
+                YoutubeQuotaLedger.endpoint != ALL,
+            )
+            if user_id is not None:
+                query = query.filter(YoutubeQuotaLedger.user_key == str(user_id))
+            usage = {}
+            for row in query.all():
+                usage.setdefault(row.user_key, {})[row.endpoint] = {"units": row.units, "calls": row.calls}
+            return usage
+        finally:
+            db.close()
+
+quota_manager = QuotaManager(YOUTUBE_DAILY_QUOTA, YOUTUBE_USER_DAILY_QUOTA)
@@ -0,0 +1,190 @@
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict, defaultdict
+from sqlalchemy.exc import SQLAlchemyError
+from database.models import ApiResponseCache
+from database.db_connection import SessionLocal
+from config import YOUTUBE_CACHE_TTLS, YOUTUBE_CACHE_MAX_ENTRIES, YOUTUBE_CACHE_PERSISTENT
+
+IGNORED_PARAMS = {"key"}
+ID_LIST_PARAMS = {"id"}
+
+def normalize_params(params: dict) -> dict:
+    """
+    Normalizes request parameters so equivalent requests share a cache entry.
+    - Drops the API key.
+    - Lower-cases and trims the search query.
+    - Sorts comma-separated ID lists (callers map results by ID, not position).
+    """
+    normalized = {}
+    for name, value in params.items():
+        if name in IGNORED_PARAMS or value is None:
+            continue
+        value = str(value).strip()
+        if name == "q":
+            value = " ".join(value.lower().split())
+        elif name in ID_LIST_PARAMS:
+            value = ",".join(sorted(set(part for part in value.split(",") if part)))
+        normalized[name] = value
+    return normalized
+
+def make_cache_key(endpoint: str, params: dict) -> str:
+    payload = json.dumps({"endpoint": endpoint, "params": normalize_params(params)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache for YouTube Data API responses.
+    - Tier 1: size-bounded in-memory LRU.
+    - Tier 2 (optional): `api_response_cache` table, which survives restarts.
+    Entries expire after the TTL configured for their endpoint.
+    """
+
+    def __init__(self, ttls: dict, max_entries: int, persistent: bool = False):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+
+    def is_cacheable(self, endpoint: str) -> bool:
+        return self.ttls.get(endpoint, 0) > 0
+
+    def get(self, endpoint: str, params: dict):
+        """Returns the cached response, or None on a miss."""
+        if not self.is_cacheable(endpoint):
+            return None
+
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats[endpoint]["memory_hits"] += 1
+                    return response
+                del self._entries[key]
+
+        if self.persistent:
+            row = self._load_persistent(key)
+            if row is not None:
+                expires_at, response = row
+                self._remember(endpoint, key, response, expires_at)
+                with self._lock:
+                    self._stats[endpoint]["persistent_hits"] += 1
+                return response
+
+        with self._lock:
+            self._stats[endpoint]["misses"] += 1
+        return None
+
+    def set(self, endpoint: str, params: dict, response: dict):
+        """Caches a successful response; API error bodies are never cached."""
+        if not self.is_cacheable(endpoint) or "error" in response:
+            return
+
+        key = make_cache_key(endpoint, params)
+        expires_at = time.time() + self.ttls[endpoint]
+        self._remember(endpoint, key, response, expires_at)
+        with self._lock:
+            self._stats[endpoint]["stores"] += 1
+
+        if self.persistent:
+            self._store_persistent(key, endpoint, response, expires_at)
+
+    def _remember(self, endpoint, key, response, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats[endpoint]["evictions"] += 1
+
+    def _load_persistent(self, key):
+        db = SessionLocal()
+        try:
+            row = db.query(ApiResponseCache).filter(ApiResponseCache.cache_key == key).first()
+            if row is None:
+                return None
+            if row.expires_at <= datetime.utcnow():
+                db.delete(row)
+                db.commit()
+                return None
+            expires_in = (row.expires_at - datetime.utcnow()).total_seconds()
+            return time.time() + expires_in, row.response
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Response cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _store_persistent(self, key, endpoint, response, expires_at):
+        db = SessionLocal()
+        try:
+            db.merge(ApiResponseCache(
+                cache_key=key,
+                endpoint=endpoint,
+                response=response,
+                expires_at=datetime.utcnow() + timedelta(seconds=expires_at - time.time())
+            ))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Response cache write failed: {e}")
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        """Removes expired entries from both tiers and returns how many persistent rows were deleted."""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+
+        if not self.persistent:
+            return 0
+
+        db = SessionLocal()
+        try:
+            deleted = db.query(ApiResponseCache).filter(ApiResponseCache.expires_at <= datetime.utcnow()).delete()
+            db.commit()
+            return deleted
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Response cache purge failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters per endpoint, with the configured TTLs for tuning."""
+        with self._lock:
+            endpoints = {}
+            for endpoint, counters in self._stats.items():
+                lookups = counters["memory_hits"] + counters["persistent_hits"] + counters["misses"]
+                hits = lookups - counters["misses"]
+                endpoints[endpoint] = {
+                    **counters,
+                    "ttl_seconds": self.ttls.get(endpoint, 0),
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self.persistent,
+                "endpoints": endpoints,
+            }
+
+response_cache = ResponseCache(YOUTUBE_CACHE_TTLS, YOUTUBE_CACHE_MAX_ENTRIES, YOUTUBE_CACHE_PERSISTENT)
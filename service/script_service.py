@@ -1,31 +1,45 @@
 import os
 import re
-import wave
 import json
 import uuid
+import shutil
 import torch
+import httpx
 import whisper
-import requests
 import torchaudio
+import tempfile
 import subprocess
 from gtts import gTTS
 from uuid import uuid4
 from pathlib import Path
-from pydub import AudioSegment
 import google.generativeai as genai
+# from pydub import AudioSegment  # needed again if the commented-out TTS/voice-tone code is re-enabled
 # from tortoise.api import TextToSpeech
 from vosk import Model, KaldiRecognizer
 from fastapi import UploadFile, HTTPException, status
 from youtube_transcript_api import YouTubeTranscriptApi
+from service.youtube_client import youtube_get
+from service.quota_service import QuotaExceededError
 # from tortoise.utils.audio import load_audio
-from config import GEMINI_API_KEY, YOUTUBE_API_KEY, GENERATED_AUDIO_PATH, VOICE_TONE_DIR
+from service.model_registry import ModelRegistry
+from service.transcript_service import transcript_store
+from config import GEMINI_API_KEY, GENERATED_AUDIO_PATH, VOICE_TONE_DIR
+from config import WHISPER_MODEL_NAME, VOSK_MODEL_PATH, VOSK_MAX_CONCURRENCY, MODEL_IDLE_EVICT_SECONDS
 
 GEMINI_API_KEY = GEMINI_API_KEY
 genai.configure(api_key=GEMINI_API_KEY)
 
-def generate_script(transcript: str, mode: str = "Short-form", tone: str = "Casual", style: str = "Casual"):
-    print(f"Transcript inside the generate with ollama function :::::::: {transcript}")
-    print(f"mode ::: {mode} tone ::: {tone} style ::: {style}")
+def load_vosk_model():
+    if not os.path.exists(VOSK_MODEL_PATH):
+        raise Exception("Please download the Vosk model and place it in the 'models' folder.")
+    return Model(VOSK_MODEL_PATH)
+
+# A Vosk Model can be shared by many recognizers; Whisper decoding mutates model state, so one caller at a time.
+model_registry = ModelRegistry(idle_seconds=MODEL_IDLE_EVICT_SECONDS)
+model_registry.register("whisper", lambda: whisper.load_model(WHISPER_MODEL_NAME), concurrency=1)
+model_registry.register("vosk", load_vosk_model, concurrency=VOSK_MAX_CONCURRENCY)
+
+def build_script_prompt(transcript: str, mode: str = "Short-form", tone: str = "Casual", style: str = "Casual"):
     prompt = f"""Generate a YouTube video script in {mode} mode with a {tone} tone and {style} style.
         You are an expert YouTube scriptwriter. Your task is to generate a **unique and detailed YouTube video script** while maintaining the **meaning and context** of the provided transcript.  
 
@@ -45,7 +59,12 @@ def generate_script(transcript: str, mode: str = "Short-form", tone: str = "Casu
 
         ### **Generate a new, detailed, and engaging YouTube script based on the above guidelines.**  
         """
+    return prompt
 
+def generate_script(transcript: str, mode: str = "Short-form", tone: str = "Casual", style: str = "Casual"):
+    print(f"Transcript inside the generate with ollama function :::::::: {transcript}")
+    print(f"mode ::: {mode} tone ::: {tone} style ::: {style}")
+    prompt = build_script_prompt(transcript, mode, tone, style)
 
     print("Generating Script with the Gemini::::", prompt)
     model = genai.GenerativeModel("gemini-1.5-pro-latest")
@@ -58,47 +77,70 @@ def generate_script(transcript: str, mode: str = "Short-form", tone: str = "Casu
     else:
         return "Error generating script"
 
-def convert_to_wav(input_file: str) -> str:
-    file_ext = os.path.splitext(input_file)[-1].lower()
-    wav_file = input_file.replace(file_ext, ".wav")
- 
-    if file_ext != ".wav":
-        audio = AudioSegment.from_file(input_file, format=file_ext.replace(".", ""))
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)  # Mono, 16kHz, 16-bit PCM
-        audio.export(wav_file, format="wav")
- 
-    return wav_file
- 
-def transcribe_audio(file_path: str):
-    model_path = "action_models/vosk-model-small-en-us-0.15" 
-    if not os.path.exists(model_path):
-        raise Exception("Please download the Vosk model and place it in the 'models' folder.")
-
-    wav_file = convert_to_wav(file_path)
+def stream_script(transcript: str, mode: str = "Short-form", tone: str = "Casual", style: str = "Casual"):
+    """Yields raw script text chunks from Gemini as they are generated."""
+    prompt = build_script_prompt(transcript, mode, tone, style)
+    model = genai.GenerativeModel("gemini-1.5-pro-latest")
+    for chunk in model.generate_content(prompt, stream=True):
+        if chunk.candidates and chunk.text:
+            yield chunk.text
 
-    try:
-        with wave.open(wav_file, "rb") as wf:
-            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-                raise Exception("Audio file must be WAV format mono PCM.")
+PCM_SAMPLE_RATE = 16000
+PCM_FRAMES_PER_READ = 4000
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
-            model = Model(model_path)
-            rec = KaldiRecognizer(model, wf.getframerate())
-            result_text = ""
+def save_upload_to_temp(upload: UploadFile) -> str:
+    """
+    Copies an upload to a uniquely named temp file in UPLOAD_CHUNK_BYTES pieces.
+    The caller removes the file. A real file (not stdin) keeps MP4/M4A decodable: ffmpeg has to seek for their index.
+    """
+    suffix = Path(upload.filename or "").suffix.lower()
+    with tempfile.NamedTemporaryFile(prefix="stt_", suffix=suffix, delete=False) as temp_file:
+        shutil.copyfileobj(upload.file, temp_file, UPLOAD_CHUNK_BYTES)
+    return temp_file.name
 
+def decode_to_pcm(input_file: str, sample_rate: int = PCM_SAMPLE_RATE):
+    """
+    Streams any ffmpeg-readable audio as 16-bit mono PCM chunks of PCM_FRAMES_PER_READ frames.
+    ffmpeg resamples on the fly and the stdout pipe applies backpressure, so memory stays flat whatever the input length.
+    """
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", input_file,
+             "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+        try:
             while True:
-                data = wf.readframes(4000)
-                if len(data) == 0:
+                data = process.stdout.read(PCM_FRAMES_PER_READ * 2)
+                if not data:
                     break
-                if rec.AcceptWaveform(data):
-                    res = json.loads(rec.Result())
-                    result_text += " " + res.get("text", "")
+                yield data
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+        if process.returncode != 0:
+            errors.seek(0)
+            detail = errors.read(2000).decode(errors="replace").strip()
+            raise Exception(f"Could not decode audio: {detail or 'ffmpeg exited with ' + str(process.returncode)}")
+
+def transcribe_audio(file_path: str):
+    # load_vosk_model raises when the model files are missing.
+    with model_registry.use("vosk") as model:
+        rec = KaldiRecognizer(model, PCM_SAMPLE_RATE)
+        result_text = ""
 
-            res = json.loads(rec.FinalResult())
-            result_text += " " + res.get("text", "")
+        for data in decode_to_pcm(file_path):
+            if rec.AcceptWaveform(data):
+                res = json.loads(rec.Result())
+                result_text += " " + res.get("text", "")
 
-    finally:
-        if os.path.exists(wav_file):
-            os.remove(wav_file)
+        res = json.loads(rec.FinalResult())
+        result_text += " " + res.get("text", "")
 
     return {"transcription": result_text.strip()}
 
@@ -208,35 +250,33 @@ def transcribe_audio(file_path: str):
 #     except Exception as e:
 #         print("facing error inside function :: ", e)
 
-def get_video_details(query: str, max_results: int = 5):
+def get_video_details(query: str, max_results: int = 5, user_id: int = None):
     """
     Uses the YouTube Data API to search for videos matching the query.
     """
-    url = "https://www.googleapis.com/youtube/v3/search"
     params = {
         "part": "snippet",
         "q": query,
         "maxResults": max_results,
-        "key": YOUTUBE_API_KEY,
         "type": "video"
     }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        items = response.json().get("items", [])
-        video_details = []
-        for item in items:
-            video_id = item["id"]["videoId"]
-            title = item["snippet"]["title"]
-            link = f"https://www.youtube.com/watch?v={video_id}"
-            video_details.append({
-                "video_id": video_id,
-                "title": title,
-                "link": link
-            })
-        return video_details
-    else:
+    try:
+        items = youtube_get("search", params, user_id=user_id).get("items", [])
+    except (httpx.HTTPError, QuotaExceededError):
         return []
 
+    video_details = []
+    for item in items:
+        video_id = item["id"]["videoId"]
+        title = item["snippet"]["title"]
+        link = f"https://www.youtube.com/watch?v={video_id}"
+        video_details.append({
+            "video_id": video_id,
+            "title": title,
+            "link": link
+        })
+    return video_details
+
 def get_video_id(youtube_url: str):
     """
     Extracts the video ID from a YouTube URL.
@@ -246,17 +286,27 @@ def get_video_id(youtube_url: str):
 
 def fetch_transcript(youtube_url: str):
     """
-    Fetches the transcript of a YouTube video.
+    Fetches the transcript of a YouTube video through the `transcripts` table.
+    Only the first request for a video downloads captions (or transcribes with Whisper); later and
+    concurrent requests reuse that result.
     """
     video_id = get_video_id(youtube_url)
     if not video_id:
         return None, "Invalid YouTube URL"
+    return transcript_store.get_or_fetch(video_id, lambda: download_transcript(youtube_url, video_id))
+
+def download_transcript(youtube_url: str, video_id: str):
+    """
+    Fetches YouTube captions, falling back to Whisper on the downloaded audio.
+    Returns ({"content", "source", "language"}, None) or (None, error).
+    """
     try:
         transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        print(f"transcript list :: {transcript_list}")
         transcript_text = " ".join([item["text"] for item in transcript_list])
-        print(f"transcript text :: {transcript_text}")
-        return (transcript_text if transcript_text else None), None
+        if not transcript_text:
+            return None, None
+        # get_transcript only returns English captions unless other languages are requested.
+        return {"content": transcript_text, "source": "captions", "language": "en"}, None
     except Exception as e:
         print(f"No subtitles found for video {video_id}. Trying Whisper transcription...")
 
@@ -265,11 +315,13 @@ def fetch_transcript(youtube_url: str):
 
         if download_audio(youtube_url, audio_path):
             try:
-                transcript_text = transcribe_audio_with_whisper(audio_path)
-                os.remove(audio_path)
-                return transcript_text, None
+                transcript_text, language = transcribe_audio_with_whisper(audio_path)
+                return {"content": transcript_text, "source": "whisper", "language": language}, None
             except Exception as whisper_error:
                 return None, f"Whisper transcription failed: {whisper_error}"
+            finally:
+                if os.path.exists(audio_path):
+                    os.remove(audio_path)
         else:
             return None, f"Failed to download audio for transcription"
 
@@ -281,12 +333,55 @@ def format_script_response(raw_script: str) -> str:
     - Removing text inside parentheses (e.g., (Upbeat background music starts playing))
     - Keeping only the actual content
     """
-    cleaned_script = re.sub(r'\(\d{1,2}:\d{2} - \d{1,2}:\d{2}\)', '', raw_script)
+    return clean_script_text(raw_script).strip()
+
+def clean_script_text(text: str) -> str:
+    """The substitutions of format_script_response; all of them stay within a line except newline collapsing."""
+    cleaned_script = re.sub(r'\(\d{1,2}:\d{2} - \d{1,2}:\d{2}\)', '', text)
     cleaned_script = re.sub(r'\*\*(.*?)\*\*', r'\1', cleaned_script)
     cleaned_script = re.sub(r'\(.*?\)', '', cleaned_script)
-    cleaned_script = re.sub(r'\n+', '\n', cleaned_script).strip()
+    return re.sub(r'\n+', '\n', cleaned_script)
+
+class IncrementalScriptFormatter:
+    """
+    Applies format_script_response to streamed text.
+    - Only complete lines are formatted, so patterns are never cut in half.
+    - Trailing whitespace is held back until more text follows, so the concatenated output equals
+      format_script_response(full_text).
+    """
 
-    return cleaned_script
+    def __init__(self):
+        self.pending = ""   # raw text after the last newline
+        self.held = ""      # formatted trailing whitespace not yet emitted
+        self.started = False
+        self.text = ""      # everything emitted so far
+
+    def _emit(self, raw: str) -> str:
+        combined = re.sub(r'\n+', '\n', self.held + clean_script_text(raw))
+        if not self.started:
+            combined = combined.lstrip()
+        body = combined.rstrip()
+        self.held = combined[len(body):]
+        if body:
+            self.started = True
+        self.text += body
+        return body
+
+    def feed(self, chunk: str) -> str:
+        """Adds a raw chunk; returns the newly formatted text (may be empty)."""
+        self.pending += chunk
+        cut = self.pending.rfind("\n")
+        if cut < 0:
+            return ""
+        raw, self.pending = self.pending[:cut + 1], self.pending[cut + 1:]
+        return self._emit(raw)
+
+    def flush(self) -> str:
+        """Formats whatever is left at the end of the stream."""
+        raw, self.pending = self.pending, ""
+        text = self._emit(raw)
+        self.held = ""
+        return text
 
 
 def download_audio(video_url: str, output_path: str) -> bool:
@@ -303,10 +398,11 @@ def download_audio(video_url: str, output_path: str) -> bool:
         print(f"Error downloading audio: {e}")
         return False
 
-def transcribe_audio_with_whisper(audio_path: str) -> str:
-    model = whisper.load_model("base")  # Or use "medium" / "large" if you want better quality
-    result = model.transcribe(audio_path)
-    return result["text"]
+def transcribe_audio_with_whisper(audio_path: str):
+    """Returns (text, detected language code) for an audio file."""
+    with model_registry.use("whisper") as model:  # WHISPER_MODEL_NAME: "medium" / "large" for better quality
+        result = model.transcribe(audio_path)
+    return result["text"], result.get("language")
 
 
 def get_user_voice_sample(user_id: int) -> str:
@@ -0,0 +1,110 @@
+import math
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database.models import Video
+from datetime import datetime, timedelta
+from config import LOCAL_SEARCH_FRESH_HOURS
+
+CANDIDATE_MULTIPLIER = 5  # Text-relevance candidates fetched per requested result before engagement re-ranking
+
+POSTGRES_INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS ix_videos_search_document ON videos
+USING GIN (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')))
+"""
+
+SQLITE_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts
+    USING fts5(title, description, content='videos', content_rowid='rowid')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO videos_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+]
+
+POSTGRES_SEARCH_SQL = """
+SELECT video_id, ts_rank(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')), query) AS relevance
+FROM videos, websearch_to_tsquery('english', :query) AS query
+WHERE to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')) @@ query
+ORDER BY relevance DESC
+LIMIT :limit
+"""
+
+SQLITE_SEARCH_SQL = """
+SELECT videos.video_id, -bm25(videos_fts) AS relevance
+FROM videos_fts JOIN videos ON videos.rowid = videos_fts.rowid
+WHERE videos_fts MATCH :query
+ORDER BY bm25(videos_fts)
+LIMIT :limit
+"""
+
+def create_search_index(engine):
+    """Creates the full-text index for the current backend: GIN over a tsvector on PostgreSQL, FTS5 on SQLite."""
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.execute(text(POSTGRES_INDEX_DDL))
+        elif engine.dialect.name == "sqlite":
+            exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'videos_fts'")).first()
+            for statement in SQLITE_INDEX_DDL:
+                connection.execute(text(statement))
+            if not exists:
+                connection.execute(text("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')"))
+
+def fts5_query(query: str) -> str:
+    """Quotes every term so user input cannot inject FTS5 operators; terms are AND-ed."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def engagement_score(relevance: float, video: Video) -> float:
+    """Text relevance boosted by how fast and how well the video performs."""
+    velocity = max(video.view_velocity or 0.0, 0.0)
+    engagement = max(video.engagement_rate or 0.0, 0.0)
+    return relevance * (1 + math.log1p(velocity)) * (1 + engagement / 100)
+
+def search_stored_videos(query: str, max_results: int, db: Session, min_views=None, min_subscribers=None):
+    """
+    Full-text search over stored video titles and descriptions; spends no API quota.
+    Returns (Video, score, is_fresh) tuples, best first. `is_fresh` tells whether the stats were
+    refreshed within LOCAL_SEARCH_FRESH_HOURS.
+    """
+    if not query.strip():
+        return []
+
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        sql, search_query = POSTGRES_SEARCH_SQL, query
+    elif dialect == "sqlite":
+        sql, search_query = SQLITE_SEARCH_SQL, fts5_query(query)
+    else:
+        raise ValueError(f"Local search is not supported on the {dialect} backend.")
+
+    candidates = db.execute(text(sql), {"query": search_query, "limit": max_results * CANDIDATE_MULTIPLIER}).all()
+    if not candidates:
+        return []
+
+    relevance = dict(candidates)
+    videos_query = db.query(Video).filter(Video.video_id.in_(relevance))
+    if min_views:
+        videos_query = videos_query.filter(Video.views >= min_views)
+    if min_subscribers:
+        videos_query = videos_query.filter(Video.subscribers >= min_subscribers)
+
+    fresh_after = datetime.utcnow() - timedelta(hours=LOCAL_SEARCH_FRESH_HOURS)
+    results = [
+        (video, engagement_score(relevance[video.video_id], video), bool(video.updated_at and video.updated_at >= fresh_after))
+        for video in videos_query.all()
+    ]
+    results.sort(key=lambda result: result[1], reverse=True)
+    return results[:max_results]
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from database.models import VideoStatsSnapshot
+from config import VIDEO_SNAPSHOT_INTERVAL_MINUTES
+from service.engagement_service import calculate_view_velocity
+
+SNAPSHOT_INTERVAL = timedelta(minutes=VIDEO_SNAPSHOT_INTERVAL_MINUTES)
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def load_recent_snapshots(video_ids, db: Session, limit: int = 3):
+    """Returns {video_id: [(captured_at, views), ...]} with the `limit` newest snapshots per video, newest first."""
+    if not video_ids:
+        return {}
+
+    ranked = (
+        select(
+            VideoStatsSnapshot.video_id,
+            VideoStatsSnapshot.captured_at,
+            VideoStatsSnapshot.views,
+            func.row_number().over(
+                partition_by=VideoStatsSnapshot.video_id,
+                order_by=VideoStatsSnapshot.captured_at.desc()
+            ).label("position"),
+        )
+        .where(VideoStatsSnapshot.video_id.in_(video_ids))
+        .subquery()
+    )
+    rows = db.execute(
+        select(ranked.c.video_id, ranked.c.captured_at, ranked.c.views)
+        .where(ranked.c.position <= limit)
+        .order_by(ranked.c.video_id, ranked.c.captured_at.desc())
+    ).all()
+
+    snapshots = {}
+    for video_id, captured_at, views in rows:
+        snapshots.setdefault(video_id, []).append((captured_at, views))
+    return snapshots
+
+def views_per_day(newer, older):
+    """Views gained per day between two (captured_at, views) points."""
+    seconds = (newer[0] - older[0]).total_seconds()
+    return (newer[1] - older[1]) * SECONDS_PER_DAY / seconds if seconds > 0 else 0.0
+
+def apply_snapshot_metrics(videos, snapshots, now):
+    """
+    Sets `view_velocity` and `view_acceleration` on each video from its snapshot history.
+    - A new snapshot is due once the newest stored one is older than SNAPSHOT_INTERVAL.
+    - Velocity is views/day between the two newest snapshots; acceleration is the change in velocity per day.
+    - Videos with a single snapshot keep the lifetime views/day estimate.
+    Returns the snapshot rows to insert.
+    """
+    new_rows = []
+
+    for video in videos:
+        history = snapshots.get(video["video_id"], [])
+        if not history or now - history[0][0] >= SNAPSHOT_INTERVAL:
+            history = [(now, video["views"])] + history
+            new_rows.append({
+                "video_id": video["video_id"],
+                "captured_at": now,
+                "views": video["views"],
+                "likes": video["likes"],
+                "comments": video["comments"],
+            })
+
+        if len(history) < 2:
+            video["view_velocity"] = calculate_view_velocity(video)
+            video["view_acceleration"] = 0.0
+            continue
+
+        velocity = max(views_per_day(history[0], history[1]), 0.0)
+        video["view_velocity"] = round(velocity, 2)
+
+        if len(history) >= 3:
+            previous_velocity = max(views_per_day(history[1], history[2]), 0.0)
+            days = (history[0][0] - history[1][0]).total_seconds() / SECONDS_PER_DAY
+            video["view_acceleration"] = round((velocity - previous_velocity) / days, 2) if days > 0 else 0.0
+        else:
+            video["view_acceleration"] = 0.0
+
+    return new_rows
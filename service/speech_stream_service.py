@@ -0,0 +1,142 @@
+import json
+import asyncio
+from vosk import KaldiRecognizer
+from fastapi import WebSocket, WebSocketDisconnect
+from service.script_service import model_registry
+from config import STT_STREAM_IDLE_SECONDS, STT_STREAM_MAX_SECONDS
+
+AUDIO_FORMATS = ("pcm", "opus")
+DECODED_SAMPLE_RATE = 16000
+PCM_READ_BYTES = 8000  # 0.25s of 16 kHz 16-bit mono per recognizer call
+END_OF_STREAM = ("eof", '{"eof": 1}', '{"event": "end"}')
+
+class TranscriberBusyError(Exception):
+    """Raised when every Vosk slot is taken; the client should retry later."""
+
+class StreamingTranscriber:
+    """
+    Wraps one KaldiRecognizer over the shared Vosk model.
+    `accept` returns the messages to push for a PCM chunk:
+    - {"type": "result", "text": ...} when Vosk closes an utterance (Result)
+    - {"type": "partial", "partial": ...} when the running hypothesis changed (PartialResult)
+    """
+
+    def __init__(self, model, sample_rate: int):
+        self.recognizer = KaldiRecognizer(model, sample_rate)
+        self.last_partial = ""
+        self.remainder = b""
+
+    def accept(self, pcm: bytes):
+        # Chunks may split a 16-bit sample; keep the odd byte for the next call.
+        pcm = self.remainder + pcm
+        cut = len(pcm) - len(pcm) % 2
+        pcm, self.remainder = pcm[:cut], pcm[cut:]
+        if not pcm:
+            return []
+
+        if self.recognizer.AcceptWaveform(pcm):
+            self.last_partial = ""
+            return [{"type": "result", **json.loads(self.recognizer.Result())}]
+
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        if partial == self.last_partial:
+            return []
+        self.last_partial = partial
+        return [{"type": "partial", "partial": partial}]
+
+    def finish(self):
+        return {"type": "final", **json.loads(self.recognizer.FinalResult())}
+
+async def receive_audio(websocket: WebSocket, idle_seconds: float = STT_STREAM_IDLE_SECONDS, max_seconds: float = STT_STREAM_MAX_SECONDS):
+    """
+    Yields binary frames until the client sends an end-of-stream text frame; raises on disconnect.
+    The stream also ends after `idle_seconds` without a frame or `max_seconds` in total, so an abandoned
+    socket cannot hold a Vosk slot indefinitely.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    while True:
+        timeout = min(idle_seconds, deadline - loop.time())
+        if timeout <= 0:
+            print("Speech stream reached its maximum duration")
+            return
+        try:
+            message = await asyncio.wait_for(websocket.receive(), timeout)
+        except asyncio.TimeoutError:
+            print("Speech stream timed out waiting for audio")
+            return
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes"):
+            yield message["bytes"]
+        elif (message.get("text") or "").strip().lower() in END_OF_STREAM:
+            return
+
+async def push_results(websocket: WebSocket, transcriber: StreamingTranscriber, pcm: bytes):
+    # AcceptWaveform is CPU bound; keep it off the event loop.
+    for message in await asyncio.to_thread(transcriber.accept, pcm):
+        await websocket.send_json(message)
+
+async def stream_pcm(websocket: WebSocket, transcriber: StreamingTranscriber):
+    async for chunk in receive_audio(websocket):
+        await push_results(websocket, transcriber, chunk)
+
+async def stream_opus(websocket: WebSocket, transcriber: StreamingTranscriber):
+    """
+    Decodes Ogg/WebM Opus (what MediaRecorder produces) through an ffmpeg subprocess.
+    Frames are written to ffmpeg's stdin while its 16 kHz PCM output is read back concurrently;
+    `drain` applies backpressure so neither side buffers more than a pipe's worth.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(DECODED_SAMPLE_RATE), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+    )
+
+    async def feed():
+        try:
+            async for chunk in receive_audio(websocket):
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while True:
+            pcm = await process.stdout.read(PCM_READ_BYTES)
+            if not pcm:
+                break
+            await push_results(websocket, transcriber, pcm)
+        await feeder
+    finally:
+        feeder.cancel()
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+async def stream_transcription(websocket: WebSocket, audio_format: str = "pcm", sample_rate: int = DECODED_SAMPLE_RATE):
+    """
+    Transcribes audio frames from an accepted WebSocket as they arrive.
+    - pcm: raw 16-bit little-endian mono at `sample_rate`
+    - opus: Ogg/WebM Opus, decoded to 16 kHz by ffmpeg
+    Pushes partial/result messages while streaming and a final message once the client sends "eof"
+    (or the stream hits its idle or maximum-duration timeout).
+    Holds one Vosk slot of the model registry for the lifetime of the stream; raises TranscriberBusyError
+    right away when none is free instead of queueing behind other streams and uploads.
+    """
+    # Non-blocking on the slot; the thread only covers loading the model on first use.
+    model = await asyncio.to_thread(model_registry.acquire, "vosk", False)
+    if model is None:
+        raise TranscriberBusyError("All speech-to-text slots are busy. Try again later.")
+    try:
+        if audio_format == "opus":
+            transcriber = StreamingTranscriber(model, DECODED_SAMPLE_RATE)
+            await stream_opus(websocket, transcriber)
+        else:
+            transcriber = StreamingTranscriber(model, sample_rate)
+            await stream_pcm(websocket, transcriber)
+        await websocket.send_json(await asyncio.to_thread(transcriber.finish))
+    finally:
+        model_registry.release("vosk")
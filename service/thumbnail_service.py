@@ -118,7 +118,7 @@ def save_thumbnail(video):
 
 def store_thumbnails(keyword, current_user: User = Depends(get_current_user)):
     """Fetches thumbnails from YouTube, analyzes them, and stores them in the database."""
-    videos = fetch_video_thumbnails(keyword)
+    videos = fetch_video_thumbnails(keyword, current_user.id)
     if not videos:
         return {"message": "No thumbnails found for this keyword."}
 
@@ -0,0 +1,171 @@
+import re
+import threading
+import numpy as np
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from database.models import GeneratedTitle
+from database.db_connection import SessionLocal
+from config import TITLE_CACHE_ENABLED, TITLE_CACHE_SIMILARITY_THRESHOLD, TITLE_CACHE_MAX_ENTRIES
+
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+NEGATION_WORDS = {
+    "no", "not", "never", "without", "nor", "none", "nothing", "nobody", "avoid", "stop",
+    "dont", "doesnt", "didnt", "cant", "cannot", "wont", "isnt", "arent", "wasnt", "shouldnt",
+}
+
+VIDEO_URL_PATTERN = re.compile(r"(?:youtube\.com/(?:watch\?(?:\S*&)?v=|shorts/|embed/|live/)|youtu\.be/)([0-9A-Za-z_-]{11})")
+VIDEO_KEY_PREFIX = "video:"
+
+def normalize_topic(topic: str) -> str:
+    """
+    Cache key for a topic or URL.
+    - YouTube URLs become "video:<id>" (the ID is case-sensitive, so it is not lower-cased).
+    - Topics are lower-cased and stripped of punctuation; stop words and word order are kept because they carry meaning.
+    """
+    match = VIDEO_URL_PATTERN.search(topic)
+    if match:
+        return VIDEO_KEY_PREFIX + match.group(1)
+    return " ".join(re.findall(r"\w+", topic.lower().replace("'", "").replace("’", "")))
+
+def guard_tokens(key: str) -> frozenset:
+    """
+    Numbers and negations in a normalized topic; a near match is only accepted when these agree exactly.
+    A video key is its own guard, so it never near-matches another video or a topic.
+    """
+    if key.startswith(VIDEO_KEY_PREFIX):
+        return frozenset([key])
+    return frozenset(word for word in key.split() if word in NEGATION_WORDS or any(char.isdigit() for char in word))
+
+class SemanticTitleCache:
+    """
+    Reuses earlier generated titles for the same or a near-identical topic.
+    - Exact lookup on the normalized topic key.
+    - Otherwise nearest neighbour by cosine similarity over character n-gram vectors
+      (HashingVectorizer, so nothing has to be fitted), kept in an in-process sparse index.
+      The match is lexical, not semantic, so it is restricted to candidates whose numbers and
+      negations are identical ("iphone 16" never reuses "iphone 15", "how not to" never reuses "how to").
+      Paraphrases with different wording ("lose weight fast tips" vs "how to lose weight fast") miss.
+    - YouTube URLs are keyed by video ID and only ever hit exactly.
+    - The index warms itself from generated_titles on first use and keeps the newest `max_entries` topics.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, enabled: bool = True):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.vectorizer = HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), n_features=2 ** 18, alternate_sign=False)
+        self._keys = []        # normalized topics, oldest first; row i of _matrix embeds _keys[i]
+        self._titles = {}      # normalized topic -> titles
+        self._guards = {}      # normalized topic -> guard_tokens(topic)
+        self._pending = []     # embeddings not yet stacked into _matrix
+        self._matrix = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+        self._best_similarity = [0] * len(SIMILARITY_BUCKETS)
+
+    def _load(self):
+        """Seeds the index with the newest stored results (called under the lock)."""
+        self._loaded = True
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(GeneratedTitle.video_topic, GeneratedTitle.titles)
+                .filter(GeneratedTitle.video_topic.isnot(None))
+                .order_by(GeneratedTitle.id.desc())
+                .limit(self.max_entries)
+                .all()
+            )
+        except Exception as e:
+            print(f"Title cache warm-up skipped: {e}")
+            return
+        finally:
+            db.close()
+        for topic, titles in reversed(rows):
+            if isinstance(titles, list) and titles:
+                self._add(normalize_topic(topic), titles)
+
+    def _add(self, key: str, titles):
+        if key in self._titles:
+            self._titles[key] = titles
+            return
+        self._keys.append(key)
+        self._titles[key] = titles
+        self._guards[key] = guard_tokens(key)
+        self._pending.append(self.vectorizer.transform([key]))
+
+        if len(self._keys) > self.max_entries:
+            # Trim an extra 10% of capacity so the matrix is not re-sliced on every insert.
+            drop = len(self._keys) - self.max_entries + self.max_entries // 10
+            self._flush_pending()
+            for old_key in self._keys[:drop]:
+                self._titles.pop(old_key, None)
+                self._guards.pop(old_key, None)
+            self._keys = self._keys[drop:]
+            self._matrix = self._matrix[drop:]
+
+    def _flush_pending(self):
+        if self._pending:
+            blocks = ([self._matrix] if self._matrix is not None else []) + self._pending
+            self._matrix = vstack(blocks).tocsr()
+            self._pending = []
+
+    def _record_similarity(self, similarity: float):
+        for index, upper in enumerate(SIMILARITY_BUCKETS):
+            if similarity <= upper:
+                self._best_similarity[index] += 1
+                return
+
+    def lookup(self, topic: str):
+        """Returns (titles, "exact" | "semantic", similarity) on a hit, or None."""
+        if not self.enabled:
+            return None
+        key = normalize_topic(topic)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._stats["lookups"] += 1
+
+            if key in self._titles:
+                self._stats["exact_hits"] += 1
+                return self._titles[key], "exact", 1.0
+
+            self._flush_pending()
+            if not key.startswith(VIDEO_KEY_PREFIX) and self._matrix is not None and self._matrix.shape[0]:
+                similarities = (self._matrix @ self.vectorizer.transform([key]).T).toarray().ravel()
+                self._record_similarity(float(similarities.max()))
+                guards = guard_tokens(key)
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                for index in candidates[np.argsort(-similarities[candidates])]:
+                    if self._guards[self._keys[index]] == guards:
+                        self._stats["semantic_hits"] += 1
+                        return self._titles[self._keys[index]], "semantic", round(float(similarities[index]), 4)
+
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, topic: str, titles):
+        if not self.enabled or not titles:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._add(normalize_topic(topic), titles)
+            self._stats["stores"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["lookups"]
+            hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+            return {
+                **self._stats,
+                "enabled": self.enabled,
+                "entries": len(self._keys),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "similarity_threshold": self.threshold,
+                "best_similarity_histogram": {
+                    f"<={upper}": count for upper, count in zip(SIMILARITY_BUCKETS, self._best_similarity)
+                },
+            }
+
+title_cache = SemanticTitleCache(TITLE_CACHE_SIMILARITY_THRESHOLD, TITLE_CACHE_MAX_ENTRIES, TITLE_CACHE_ENABLED)
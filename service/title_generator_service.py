@@ -1,19 +1,36 @@
-import os
 import re
-import requests
+import json
+import time
+import httpx
+import asyncio
+import threading
+from sqlalchemy import insert
 from dotenv import load_dotenv
-from langchain.tools import Tool
 from sqlalchemy.orm import Session
-from langchain_community.llms import Ollama
 from database.models import GeneratedTitle
-from langchain.memory import ConversationBufferMemory
-from langchain.agents import initialize_agent, AgentType
+from database.db_connection import SessionLocal
+from service.youtube_client import youtube_get
+from service.quota_service import QuotaExceededError
+from service.title_memory_service import title_memory
+from service.title_cache_service import title_cache
+from config import OLLAMA_MODEL, TITLE_BATCH_CONCURRENCY, TITLE_GENERATION_MODE
 
 load_dotenv()
 
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+# LangChain, the Ollama client and the agent are built on first use, not at import time.
+_llms = {}  # output format (None or "json") -> Ollama LLM
+_llm_lock = threading.Lock()
+_agent = None
+_agent_build_seconds = None
+_agent_lock = threading.Lock()
 
-llm = Ollama(model="llama3.2:1b")  
+MAX_TITLES = 5
+TITLE_MODES = ("agent", "direct")
+
+TITLE_JSON_INSTRUCTIONS = (
+    'Respond with JSON only, in exactly this form: '
+    '{"titles": ["first title", "second title", "third title", "fourth title", "fifth title"]}'
+)
 
 def extract_video_id(youtube_url: str) -> str:
     """Extracts video ID from a YouTube URL."""
@@ -26,12 +43,8 @@ def get_video_metadata(youtube_url: str):
     if not video_id:
         return None, None
 
-    api_url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet&id={video_id}&key={YOUTUBE_API_KEY}"
-
     try:
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = youtube_get("videos", {"part": "snippet", "id": video_id})
 
         if "items" in data and len(data["items"]) > 0:
             snippet = data["items"][0]["snippet"]
@@ -40,7 +53,7 @@ def get_video_metadata(youtube_url: str):
             return video_topic, video_description
         else:
             return None, None
-    except requests.exceptions.RequestException:
+    except (httpx.HTTPError, QuotaExceededError):
         return None, None
 
 def process_generated_titles(response: str) -> list:
@@ -49,9 +62,39 @@ def process_generated_titles(response: str) -> list:
         return []
 
     titles = response.strip().split("\n")
-    titles = [re.sub(r"^\d+[\.\)]?\s*", "", title).strip() for title in titles if title.strip()]
+    titles = [clean_title_line(title) for title in titles if title.strip()]
     
-    return titles[:5]  
+    return titles[:MAX_TITLES]  
+
+def clean_title_line(line: str) -> str:
+    """Strips list numbering ("1.", "2)") and whitespace from one generated line."""
+    return re.sub(r"^\d+[\.\)]?\s*", "", line).strip()
+
+class IncrementalTitleParser:
+    """Applies process_generated_titles to streamed text, releasing each title once its line is complete."""
+
+    def __init__(self):
+        self.pending = ""
+        self.titles = []
+
+    def _take(self, lines):
+        new_titles = []
+        for line in lines:
+            if line.strip() and len(self.titles) < MAX_TITLES:
+                # process_generated_titles strips the whole response, i.e. the first line's indentation.
+                self.titles.append(clean_title_line(line if self.titles else line.lstrip()))
+                new_titles.append(self.titles[-1])
+        return new_titles
+
+    def feed(self, chunk: str) -> list:
+        """Adds a raw chunk; returns the titles completed by it."""
+        self.pending += chunk
+        *lines, self.pending = self.pending.split("\n")
+        return self._take(lines)
+
+    def flush(self) -> list:
+        lines, self.pending = [self.pending], ""
+        return self._take(lines)
 
 def generate_titles_prompt(video_topic: str, video_description: str = "") -> str:
     """Creates a structured prompt for generating video titles."""
@@ -67,48 +110,282 @@ def detect_input_type(user_input: str):
         return "url"
     return "topic"
 
-title_tool = Tool(
-    name="YouTubeTitleGenerator",
-    func=lambda input_text: generate_titles_prompt(*get_video_metadata(input_text)) 
-    if detect_input_type(input_text) == "url" 
-    else generate_titles_prompt(input_text),
-    description="Generates 5 viral YouTube video titles based on a YouTube video URL or a topic."
-)
+def get_title_llm(output_format: str = None):
+    """Returns the shared Ollama LLM (optionally constrained to `output_format`, e.g. "json"), created once on first use."""
+    llm = _llms.get(output_format)
+    if llm is None:
+        with _llm_lock:
+            llm = _llms.get(output_format)
+            if llm is None:
+                from langchain_community.llms import Ollama
+                llm = Ollama(model=OLLAMA_MODEL, format=output_format) if output_format else Ollama(model=OLLAMA_MODEL)
+                _llms[output_format] = llm
+    return llm
 
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+def build_title_agent():
+    """
+    Imports LangChain and builds the Ollama-backed title agent with its tool.
+    The agent holds no memory of its own; each call passes that user's history as `chat_history`.
+    """
+    from langchain.tools import Tool
+    from langchain.prompts import MessagesPlaceholder
+    from langchain.agents import initialize_agent, AgentType
 
-agent = initialize_agent(
-    tools=[title_tool],
-    llm=llm,
-    agent=AgentType.OPENAI_FUNCTIONS,
-    verbose=True,
-    memory=memory,
-    handle_parsing_errors=True
-)
+    llm = get_title_llm()
+
+    title_tool = Tool(
+        name="YouTubeTitleGenerator",
+        func=lambda input_text: generate_titles_prompt(*get_video_metadata(input_text)) 
+        if detect_input_type(input_text) == "url" 
+        else generate_titles_prompt(input_text),
+        description="Generates 5 viral YouTube video titles based on a YouTube video URL or a topic."
+    )
+
+    return initialize_agent(
+        tools=[title_tool],
+        llm=llm,
+        agent=AgentType.OPENAI_FUNCTIONS,
+        verbose=True,
+        agent_kwargs={"extra_prompt_messages": [MessagesPlaceholder(variable_name="chat_history")]},
+        handle_parsing_errors=True
+    )
+
+def get_title_agent():
+    """Returns the shared title agent, building it once on first use (double-checked under a lock)."""
+    global _agent, _agent_build_seconds
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                started = time.perf_counter()
+                agent = build_title_agent()
+                _agent_build_seconds = round(time.perf_counter() - started, 3)
+                _agent = agent
+    return _agent
 
-def generate_ai_titles(user_input: str, user_id: int, db: Session):
+def warm_up_title_agent():
     """
-    Generates 5 AI-powered YouTube titles.
-    - Ensures agent invocation is successful.
-    - Stores generated titles as a single JSON list instead of separate rows.
+    Readiness hook: builds the agent now instead of on the first title request.
+    Returns {"ready": bool, "build_seconds": float | None, "error": str (only when not ready)}.
     """
-    if not isinstance(db, Session):
-        raise TypeError(f"Expected 'db' to be a Session instance, but got {type(db)}")
-
     try:
-        response = agent.invoke({"input": generate_titles_prompt(user_input)})
-        if isinstance(response, dict) and "output" in response:
-            response = response["output"]
-        if not isinstance(response, str):
-            raise ValueError(f"Unexpected agent response format: {response}")
-    except Exception:
-        raise ValueError("Failed to generate titles. Please try again later.")
+        get_title_agent()
+    except Exception as e:
+        return {"ready": False, "build_seconds": None, "error": str(e)}
+    return {"ready": True, "build_seconds": _agent_build_seconds}
+
+def to_chat_messages(history):
+    """Converts [(user_text, ai_text), ...] into LangChain chat messages."""
+    from langchain_core.messages import HumanMessage, AIMessage
 
-    titles = process_generated_titles(response)
+    messages = []
+    for user_text, ai_text in history:
+        messages.extend([HumanMessage(content=user_text), AIMessage(content=ai_text)])
+    return messages
 
+def save_generated_titles(user_input: str, titles: list, user_id: int, db: Session):
     db_title = GeneratedTitle(video_topic=user_input, titles=titles, user_id=user_id)
     db.add(db_title)
     db.commit()
     db.refresh(db_title)
+    return db_title
+
+def bulk_save_generated_titles(rows, db: Session):
+    """Inserts many GeneratedTitle rows in one statement."""
+    db.execute(insert(GeneratedTitle), rows)
+    db.commit()
+
+def parse_titles_output(text: str):
+    """
+    Parses a direct-mode completion.
+    Expects {"titles": [...]}, also accepting a bare JSON list or JSON wrapped in prose.
+    Falls back to line parsing (process_generated_titles) when no JSON is found.
+    Returns (titles, structured) where `structured` tells whether JSON parsing succeeded.
+    """
+    match = re.search(r"[\[{].*[\]}]", text or "", re.DOTALL)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            data = data.get("titles")
+        if isinstance(data, list):
+            titles = [clean_title_line(str(title)) for title in data if str(title).strip()]
+            if titles:
+                return titles[:MAX_TITLES], True
+    return process_generated_titles(text), False
+
+def render_titles_prompt(user_input: str):
+    """generate_titles_prompt for a topic, or for the video's title and description when given a YouTube URL."""
+    if detect_input_type(user_input) == "url":
+        video_topic, video_description = get_video_metadata(user_input)
+        return generate_titles_prompt(video_topic or user_input, video_description or "")
+    return generate_titles_prompt(user_input)
+
+def render_direct_prompt(user_input: str, history=()):
+    """render_titles_prompt, prior turns as plain text, and the JSON instructions."""
+    prompt = render_titles_prompt(user_input)
+    previous = "".join(f"Earlier request:\n{user_text}\nEarlier answer:\n{ai_text}\n\n" for user_text, ai_text in history)
+    return f"{previous}{prompt}\n\n{TITLE_JSON_INSTRUCTIONS}"
+
+def generate_titles_direct(prompt: str):
+    """
+    Exactly one LLM call in JSON mode, no agent loop.
+    Returns (titles, info) with the raw text, whether JSON parsing succeeded and Ollama's token counts.
+    """
+    result = get_title_llm("json").generate([prompt])
+    generation = result.generations[0][0]
+    titles, structured = parse_titles_output(generation.text)
+    usage = generation.generation_info or {}
+    return titles, {
+        "text": generation.text,
+        "structured": structured,
+        "prompt_tokens": usage.get("prompt_eval_count"),
+        "completion_tokens": usage.get("eval_count"),
+    }
+
+def generate_titles_with_agent(prompt: str, history=(), callbacks=None):
+    """Runs the agent loop and returns its raw text output."""
+    config = {"callbacks": callbacks} if callbacks else None
+    response = get_title_agent().invoke({"input": prompt, "chat_history": to_chat_messages(history)}, config=config)
+    if isinstance(response, dict) and "output" in response:
+        response = response["output"]
+    if not isinstance(response, str):
+        raise ValueError(f"Unexpected agent response format: {response}")
+    return response
+
+def resolve_titles(user_input: str, user_id: int, use_history: bool = True, use_cache: bool = True, mode: str = None):
+    """
+    Produces titles for one topic or URL without touching the database.
+    - Returns earlier titles for the same or a near-identical topic from the semantic cache when possible.
+    - Otherwise generates with this user's token-capped history (none when `use_history=False`).
+    - `mode` "agent" runs the LangChain agent loop; "direct" makes one JSON-mode LLM call.
+      Defaults to TITLE_GENERATION_MODE.
+    Returns {"titles": [...]} plus "cache" and "similarity" on a cache hit.
+    """
+    mode = mode or TITLE_GENERATION_MODE
+    if mode not in TITLE_MODES:
+        raise ValueError(f"Unknown title generation mode: {mode}")
+
+    cached = title_cache.lookup(user_input) if use_cache else None
+    if cached:
+        titles, match, similarity = cached
+        return {"titles": titles, "cache": match, "similarity": similarity}
+
+    history = title_memory.history(user_id) if use_history else []
+
+    try:
+        if mode == "direct":
+            prompt = render_direct_prompt(user_input, history)
+            titles, _ = generate_titles_direct(prompt)
+            response = "\n".join(titles)
+        else:
+            prompt = generate_titles_prompt(user_input)
+            response = generate_titles_with_agent(prompt, history)
+            titles = process_generated_titles(response)
+    except Exception:
+        raise ValueError("Failed to generate titles. Please try again later.")
 
+    if use_history:
+        title_memory.append(user_id, generate_titles_prompt(user_input), response)
+
+    title_cache.store(user_input, titles)
     return {"titles": titles}
+
+def generate_ai_titles(user_input: str, user_id: int, db: Session, use_history: bool = True, use_cache: bool = True, mode: str = None):
+    """
+    Generates 5 AI-powered YouTube titles.
+    - Ensures agent invocation is successful.
+    - Stores generated titles as a single JSON list instead of separate rows.
+    """
+    if not isinstance(db, Session):
+        raise TypeError(f"Expected 'db' to be a Session instance, but got {type(db)}")
+
+    result = resolve_titles(user_input, user_id, use_history, use_cache, mode)
+    save_generated_titles(user_input, result["titles"], user_id, db)
+    return result
+
+def dedupe_topics(topics):
+    """Drops blank and repeated topics (ignoring case and extra whitespace), keeping the first spelling."""
+    unique = {}
+    for topic in topics:
+        cleaned = " ".join(topic.split())
+        if cleaned and cleaned.lower() not in unique:
+            unique[cleaned.lower()] = cleaned
+    return list(unique.values())
+
+async def generate_ai_titles_batch(topics, user_id: int, db: Session, use_history: bool = False,
+                                   use_cache: bool = True, concurrency: int = TITLE_BATCH_CONCURRENCY, mode: str = None):
+    """
+    Generates titles for many topics or URLs.
+    - Topics are deduplicated.
+    - At most `concurrency` LLM calls run at once, each in a worker thread.
+    - A failed item is reported in its own result and does not fail the batch.
+    - All successful results are persisted with one bulk insert.
+    Returns per-topic results in input order (after deduplication).
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(topic):
+        async with semaphore:
+            try:
+                result = await asyncio.to_thread(resolve_titles, topic, user_id, use_history, use_cache, mode)
+                return {"topic": topic, **result}
+            except Exception as e:
+                return {"topic": topic, "error": str(e)}
+
+    results = await asyncio.gather(*(run(topic) for topic in dedupe_topics(topics)))
+
+    rows = [
+        {"video_topic": result["topic"], "titles": result["titles"], "user_id": user_id}
+        for result in results if "titles" in result
+    ]
+    if rows:
+        await asyncio.to_thread(bulk_save_generated_titles, rows, db)
+
+    return {
+        "results": results,
+        "succeeded": len(rows),
+        "failed": len(results) - len(rows),
+    }
+
+def stream_ai_titles(user_input: str, user_id: int, use_cache: bool = True):
+    """
+    Streams title generation as (event, payload) pairs.
+    - "token": raw LLM text as it arrives; "title": each cleaned title as soon as its line is complete.
+    - "done": the final titles after they are persisted; "error" if generation fails.
+    Streams straight from the LLM (the agent loop cannot stream tokens), without conversation history.
+    Cache hits are replayed as "title" events right away.
+    """
+    cached = title_cache.lookup(user_input) if use_cache else None
+    parser = IncrementalTitleParser()
+
+    if cached:
+        titles, match, similarity = cached
+        for index, title in enumerate(titles):
+            yield "title", {"index": index, "title": title}
+    else:
+        try:
+            index = 0
+            for chunk in get_title_llm().stream(render_titles_prompt(user_input)):
+                yield "token", {"text": chunk}
+                for title in parser.feed(chunk):
+                    yield "title", {"index": index, "title": title}
+                    index += 1
+            for title in parser.flush():
+                yield "title", {"index": index, "title": title}
+                index += 1
+        except Exception as e:
+            print(f"Title streaming failed: {e}")
+            yield "error", {"detail": "Failed to generate titles. Please try again later."}
+            return
+        titles, match, similarity = parser.titles, None, None
+        title_cache.store(user_input, titles)
+
+    # The request-scoped session may be closed before the stream ends, so persist with a dedicated one.
+    db = SessionLocal()
+    try:
+        save_generated_titles(user_input, titles, user_id, db)
+    finally:
+        db.close()
+    yield "done", {"titles": titles, "cache": match, "similarity": similarity}
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict, deque
+from config import TITLE_MEMORY_ENABLED, TITLE_MEMORY_MAX_TOKENS, TITLE_MEMORY_MAX_USERS
+
+CHARS_PER_TOKEN = 4  # Rough token estimate; avoids loading a tokenizer for the local model
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class UserConversationMemory:
+    """
+    Chat history for the title agent, kept separately per user.
+    - Each user's history is capped at `max_tokens`; the oldest turns are dropped first.
+    - At most `max_users` histories are kept; the least recently used one is evicted.
+    - Anonymous calls (user_id None) never get history.
+    """
+
+    def __init__(self, max_tokens: int, max_users: int, enabled: bool = True):
+        self.max_tokens = max_tokens
+        self.max_users = max_users
+        self.enabled = enabled
+        self._histories = OrderedDict()  # user_id -> deque of (user_text, ai_text, tokens), oldest first
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def history(self, user_id):
+        """Returns [(user_text, ai_text), ...] for the user, oldest first."""
+        if not self.enabled or user_id is None:
+            return []
+        with self._lock:
+            turns = self._histories.get(user_id)
+            if turns is None:
+                return []
+            self._histories.move_to_end(user_id)
+            return [(user_text, ai_text) for user_text, ai_text, _ in turns]
+
+    def append(self, user_id, user_text: str, ai_text: str):
+        if not self.enabled or user_id is None:
+            return
+        tokens = estimate_tokens(user_text) + estimate_tokens(ai_text)
+        with self._lock:
+            turns = self._histories.setdefault(user_id, deque())
+            self._histories.move_to_end(user_id)
+            turns.append((user_text, ai_text, tokens))
+            self._tokens[user_id] = self._tokens.get(user_id, 0) + tokens
+
+            while turns and self._tokens[user_id] > self.max_tokens:
+                self._tokens[user_id] -= turns.popleft()[2]
+
+            while len(self._histories) > self.max_users:
+                evicted, _ = self._histories.popitem(last=False)
+                self._tokens.pop(evicted, None)
+                self._evictions += 1
+
+    def clear(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._histories.clear()
+                self._tokens.clear()
+            else:
+                self._histories.pop(user_id, None)
+                self._tokens.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "users": len(self._histories),
+                "tokens": sum(self._tokens.values()),
+                "max_tokens_per_user": self.max_tokens,
+                "max_users": self.max_users,
+                "evictions": self._evictions,
+            }
+
+title_memory = UserConversationMemory(TITLE_MEMORY_MAX_TOKENS, TITLE_MEMORY_MAX_USERS, TITLE_MEMORY_ENABLED)
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from database.models import Transcript
+from database.db_connection import SessionLocal, dialect_insert
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class InflightFetch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+class TranscriptStore:
+    """
+    Transcripts persisted in the `transcripts` table, keyed by YouTube video ID.
+    - `get_or_fetch` returns the stored transcript, or runs `fetch` once and stores what it returns.
+    - Concurrent calls for the same video wait for the caller already fetching it, so only one
+      caption download / transcription runs per video (per process).
+    - Failures are not stored; the next request retries.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "fetches": 0, "coalesced": 0, "failures": 0}
+
+    def load(self, video_id: str):
+        db = SessionLocal()
+        try:
+            return db.query(Transcript.content).filter(Transcript.video_id == video_id).scalar()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Transcript lookup failed for {video_id}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def save(self, video_id: str, content: str, source: str, language: str = None):
+        row = {
+            "video_id": video_id,
+            "source": source,
+            "language": language,
+            "content": content,
+            "content_hash": content_hash(content),
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        db = SessionLocal()
+        try:
+            stmt = dialect_insert(db, Transcript).values(row)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["video_id"],
+                set_={column: stmt.excluded[column] for column in ("source", "language", "content", "content_hash", "updated_at")},
+                # Rewriting an identical transcript would only churn updated_at.
+                where=Transcript.content_hash != stmt.excluded.content_hash,
+            )
+            db.execute(stmt)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Transcript write failed for {video_id}: {e}")
+        finally:
+            db.close()
+
+    def get_or_fetch(self, video_id: str, fetch):
+        """
+        Returns (transcript_text, error) like `fetch_transcript`.
+        `fetch()` returns ({"content", "source", "language"}, None) or (None, error).
+        """
+        content = self.load(video_id)
+        if content:
+            self._count("hits")
+            return content, None
+
+        with self._lock:
+            inflight = self._inflight.get(video_id)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[video_id] = InflightFetch()
+
+        if not leader:
+            self._count("coalesced")
+            inflight.done.wait()
+            return inflight.result
+
+        try:
+            # Another caller may have stored it between our lookup and taking the lead.
+            content = self.load(video_id)
+            if content:
+                inflight.result = content, None
+            else:
+                self._count("fetches")
+                transcript, error = fetch()
+                if transcript and transcript["content"]:
+                    self.save(video_id, transcript["content"], transcript["source"], transcript.get("language"))
+                    inflight.result = transcript["content"], None
+                else:
+                    self._count("failures")
+                    inflight.result = None, error
+        except Exception as e:
+            self._count("failures")
+            inflight.result = None, f"Transcript fetch failed: {e}"
+        finally:
+            with self._lock:
+                del self._inflight[video_id]
+            inflight.done.set()
+
+        return inflight.result
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+transcript_store = TranscriptStore()
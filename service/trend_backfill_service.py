@@ -0,0 +1,199 @@
+import argparse
+import threading
+from datetime import datetime
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.orm import Session
+from database.db_connection import SessionLocal, dialect_insert
+from database.models import Video, TrendingTopic, BackfillCheckpoint
+from service.keyword_service import load_corpus_statistics
+from service.utils import build_term_counts, extract_keywords_batch, extract_phrases_batch
+
+JOB_NAME = "trending_topics"
+CHUNK_SIZE = 2000           # Rows pulled per server-side cursor fetch
+CHUNKS_PER_CHECKPOINT = 10  # Chunks processed per transaction/checkpoint
+MAX_PENDING_KEYWORDS = 50000  # Partial aggregate size that forces an early flush
+
+backfill_lock = threading.Lock()
+
+def load_checkpoint(db: Session):
+    return db.get(BackfillCheckpoint, JOB_NAME)
+
+def start_backfill(db: Session, restart: bool = False):
+    """
+    Returns the checkpoint to continue from.
+    A fresh run (no unfinished checkpoint, or `restart`) zeroes trending_topics counts in the same
+    transaction that records the new checkpoint. Rows are kept so trend_score / trend_growth survive.
+    """
+    checkpoint = load_checkpoint(db)
+    if checkpoint and checkpoint.status == "running" and not restart:
+        print(f"Resuming trend backfill after video {checkpoint.last_video_id} ({checkpoint.processed_videos} done)")
+        return checkpoint
+
+    db.execute(update(TrendingTopic).values(count=0))
+    if checkpoint:
+        db.delete(checkpoint)
+        db.flush()
+    checkpoint = BackfillCheckpoint(job_name=JOB_NAME, status="running", processed_videos=0)
+    db.add(checkpoint)
+    db.commit()
+    return checkpoint
+
+def live_counted_video_ids(video_ids, db: Session):
+    """
+    The subset of `video_ids` whose keywords a live detect_trending_topics call may add to the counts.
+    While a backfill is running, videos after its checkpoint are left to the backfill, which counts them
+    when it reaches them; counting them live as well would double them. Videos at or before the checkpoint
+    are counted live, since the backfill will not revisit them. The comparison runs in the database so it
+    follows the same video_id ordering as the backfill.
+    """
+    checkpoint = load_checkpoint(db)
+    if not checkpoint or checkpoint.status != "running":
+        return set(video_ids)
+    if checkpoint.last_video_id is None or not video_ids:
+        return set()
+    return {
+        video_id for (video_id,) in db.query(Video.video_id).filter(
+            Video.video_id.in_(video_ids), Video.video_id <= checkpoint.last_video_id
+        )
+    }
+
+def prune_stale_topics(db: Session):
+    """Drops keywords no stored video mentions any more and that carry no trend score."""
+    db.execute(delete(TrendingTopic).where(
+        TrendingTopic.count == 0,
+        or_(TrendingTopic.trend_score.is_(None), TrendingTopic.trend_score == 0),
+    ))
+
+def extract_chunk_keywords(titles, db: Session):
+    """
+    Batch keyword and phrase extraction for one chunk, using the persisted corpus IDF when available.
+    Returns one list of (term, trend_category) per title.
+    """
+    counts, vocabulary = build_term_counts(titles)
+    frequencies, total_documents = load_corpus_statistics(vocabulary.tolist(), db)
+    if not total_documents:
+        keywords = extract_keywords_batch(titles, counts=counts, vocabulary=vocabulary)
+    else:
+        keywords = extract_keywords_batch(titles, frequencies, total_documents, counts=counts, vocabulary=vocabulary)
+    phrases = extract_phrases_batch(titles)
+    return [
+        [(keyword, "keyword") for keyword in title_keywords] + [(phrase, "phrase") for phrase in title_phrases]
+        for title_keywords, title_phrases in zip(keywords, phrases)
+    ]
+
+def flush_keyword_counts(pending, db: Session):
+    """Adds a partial aggregate {keyword: [count, first video_id, category]} to trending_topics in one statement."""
+    if not pending:
+        return
+    stmt = dialect_insert(db, TrendingTopic).values([
+        {"keyword": keyword, "count": count, "video_id": video_id, "trend_category": category}
+        for keyword, (count, video_id, category) in sorted(pending.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["keyword"],
+        set_={"count": TrendingTopic.count + stmt.excluded.count}
+    ))
+    pending.clear()
+
+def backfill_segment(checkpoint: BackfillCheckpoint, db: Session, chunk_size: int, chunks_per_checkpoint: int):
+    """
+    Streams the next `chunk_size * chunks_per_checkpoint` videos after the checkpoint, then commits their
+    counts together with the advanced checkpoint, so a restart never double-counts a video.
+    Returns the number of videos processed (0 once the table is exhausted).
+    """
+    query = select(Video.video_id, Video.title).order_by(Video.video_id).limit(chunk_size * chunks_per_checkpoint)
+    if checkpoint.last_video_id is not None:
+        query = query.where(Video.video_id > checkpoint.last_video_id)
+
+    pending = {}
+    processed = 0
+    last_video_id = checkpoint.last_video_id
+    result = db.execute(query.execution_options(yield_per=chunk_size))
+
+    for rows in result.partitions():
+        video_ids, titles = zip(*rows)
+        for video_id, keywords in zip(video_ids, extract_chunk_keywords(list(titles), db)):
+            for keyword, category in keywords:
+                if keyword in pending:
+                    pending[keyword][0] += 1
+                else:
+                    pending[keyword] = [1, video_id, category]
+        if len(pending) > MAX_PENDING_KEYWORDS:
+            flush_keyword_counts(pending, db)
+        processed += len(video_ids)
+        last_video_id = video_ids[-1]
+
+    if processed:
+        flush_keyword_counts(pending, db)
+        checkpoint.last_video_id = last_video_id
+        checkpoint.processed_videos += processed
+        checkpoint.updated_at = datetime.utcnow()
+        db.commit()
+    return processed
+
+def backfill_trending_topics(db: Session, restart: bool = False, chunk_size: int = CHUNK_SIZE,
+                             chunks_per_checkpoint: int = CHUNKS_PER_CHECKPOINT):
+    """
+    Rebuilds trending_topics counts from every stored video.
+    - Videos are streamed in video_id order with a server-side cursor (yield_per).
+    - Keywords and phrases are extracted batch-wise per chunk.
+    - Counts merge into a bounded in-memory aggregate and are written with bulk upserts.
+    - Progress is checkpointed in backfill_checkpoints; an interrupted run resumes where it stopped.
+    - trend_score / trend_growth are left to the rolling trend window; keywords left with no count and
+      no score are pruned at the end.
+    Returns the final checkpoint as a dict.
+    """
+    checkpoint = start_backfill(db, restart)
+    while True:
+        processed = backfill_segment(checkpoint, db, chunk_size, chunks_per_checkpoint)
+        if not processed:
+            break
+        print(f"Trend backfill: {checkpoint.processed_videos} videos processed (last {checkpoint.last_video_id})")
+
+    prune_stale_topics(db)
+    checkpoint.status = "completed"
+    checkpoint.finished_at = datetime.utcnow()
+    checkpoint.updated_at = checkpoint.finished_at
+    db.commit()
+    return checkpoint_to_dict(checkpoint)
+
+def checkpoint_to_dict(checkpoint: BackfillCheckpoint):
+    if not checkpoint:
+        return {"job_name": JOB_NAME, "status": "never_run"}
+    return {
+        "job_name": checkpoint.job_name,
+        "status": checkpoint.status,
+        "last_video_id": checkpoint.last_video_id,
+        "processed_videos": checkpoint.processed_videos,
+        "started_at": checkpoint.started_at,
+        "updated_at": checkpoint.updated_at,
+        "finished_at": checkpoint.finished_at,
+    }
+
+def run_backfill_job(restart: bool = False):
+    """Background entry point: one backfill per process at a time, on its own session."""
+    if not backfill_lock.acquire(blocking=False):
+        print("Trend backfill already running in this process")
+        return
+    db = SessionLocal()
+    try:
+        backfill_trending_topics(db, restart)
+    except Exception as e:
+        db.rollback()
+        print(f"Trend backfill stopped, resume later from the last checkpoint: {e}")
+    finally:
+        db.close()
+        backfill_lock.release()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild trending_topics from the stored videos table.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an unfinished checkpoint and start over")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunks-per-checkpoint", type=int, default=CHUNKS_PER_CHECKPOINT)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(backfill_trending_topics(db, args.restart, args.chunk_size, args.chunks_per_checkpoint))
+    finally:
+        db.close()
@@ -1,40 +1,63 @@
 from sqlalchemy.orm import Session
 from database.models import Video,TrendingTopic
-from services.utils import extract_keywords
-from sqlalchemy.dialects.postgresql import insert
+from database.db_connection import dialect_insert
+from service.utils import extract_phrases_batch
+from service.keyword_service import extract_corpus_keywords
+from service.trend_window_service import update_trend_scores
+from service.trend_backfill_service import live_counted_video_ids
 
 
 def detect_trending_topics(videos, db: Session):
-    """Detects trending keywords from video titles and stores them in the database."""
+    """
+    Detects trending keywords from video titles and stores them in the database.
+    - Video existence is checked with a single IN query.
+    - Unigram keywords (trend_category "keyword") and bigram/trigram phrases ("phrase") are both tracked.
+    - All keywords are upserted in one multi-row statement that adds to the stored counts.
+    - trend_score / trend_growth are refreshed from the rolling trend window.
+    - While a trend backfill is running, counts for videos it has yet to reach are left to it
+      (see live_counted_video_ids); their keywords are still scored.
+    """
     trending_topics = {}
 
+    video_ids = {video["video_id"] for video in videos}
+    existing_ids = {
+        video_id for (video_id,) in db.query(Video.video_id).filter(Video.video_id.in_(video_ids))
+    } if video_ids else set()
+
+    stored_videos = []
     for video in videos:
+        if video["video_id"] not in existing_ids:
+            print(f"Skipping trending topic for video_id {video['video_id']} as it does not exist in 'videos' table.")
+            continue
+        stored_videos.append(video)
+
+    counted_ids = live_counted_video_ids(existing_ids, db)
+    keywords_per_video = extract_corpus_keywords(stored_videos, db)
+    phrases_per_video = extract_phrases_batch([video["title"] for video in stored_videos])
+
+    for video, keywords, phrases in zip(stored_videos, keywords_per_video, phrases_per_video):
         video_id = video["video_id"]
+        counted = video_id in counted_ids
+        for category, terms in (("keyword", keywords), ("phrase", phrases)):
+            for keyword in terms:
+                if keyword in trending_topics:
+                    trending_topics[keyword]["count"] += 1
+                else:
+                    trending_topics[keyword] = {"count": 1, "stored_count": 0, "video_id": video_id, "category": category}
+                if counted:
+                    trending_topics[keyword]["stored_count"] += 1
 
-        
-        existing_video = db.query(Video).filter(Video.video_id == video_id).first()
-        if not existing_video:
-            print(f"Skipping trending topic for video_id {video_id} as it does not exist in 'videos' table.")
-            continue  
-
-        keywords = extract_keywords(video["title"])
-        for keyword in keywords:
-            if keyword in trending_topics:
-                trending_topics[keyword]["count"] += 1
-            else:
-                trending_topics[keyword] = {"count": 1, "video_id": video_id}
-
-   
-    for keyword, data in trending_topics.items():
-        stmt = (
-            insert(TrendingTopic)
-            .values(video_id=data["video_id"], keyword=keyword, count=data["count"])  
-            .on_conflict_do_update(
-                index_elements=["keyword"],
-                set_={"count": data["count"]}
-            )
-        )
-        db.execute(stmt)
+    if trending_topics:
+        # Sorted rows keep lock order stable across concurrent upserts.
+        stmt = dialect_insert(db, TrendingTopic).values([
+            {"video_id": data["video_id"], "keyword": keyword, "count": data["stored_count"], "trend_category": data["category"]}
+            for keyword, data in sorted(trending_topics.items())
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["keyword"],
+            set_={"count": TrendingTopic.count + stmt.excluded.count}
+        ))
+        update_trend_scores({keyword: data["count"] for keyword, data in trending_topics.items()}, db)
 
     db.commit()
     return sorted(trending_topics.items(), key=lambda x: x[1]["count"], reverse=True)
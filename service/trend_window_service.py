@@ -0,0 +1,194 @@
+import heapq
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import update, bindparam
+from sqlalchemy.orm import Session
+from database.models import TrendingTopic
+from config import TREND_WINDOW_HOURS, TREND_RECENT_HOURS, TREND_SKETCH_CAPACITY
+
+BUCKET_SIZE = timedelta(hours=1)
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters counter that tracks at most `capacity` keywords.
+    When it is full, a new keyword takes over the smallest counter. Estimates may overcount by at most
+    that counter's value (kept in `errors`), and they never undercount.
+    The smallest counter is found through a min-heap with lazy deletion: every increment pushes the new
+    (count, item) pair and outdated pairs are skipped when popped, so eviction is O(log k) amortized.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+
+    def _push(self, item):
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            # Drop outdated pairs; O(k) once every ~3k increments.
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_smallest(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item
+
+    def add(self, item, count: int = 1):
+        if item in self.counts:
+            self.counts[item] += count
+            self._push(item)
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            self._push(item)
+            return
+
+        victim = self._pop_smallest()
+        floor = self.counts.pop(victim)
+        self.errors.pop(victim)
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+        self._push(item)
+
+    def estimate(self, item) -> int:
+        return self.counts.get(item, 0)
+
+class TrendWindow:
+    """
+    Rolling per-keyword counts in hourly buckets, each bucket a bounded SpaceSaving sketch.
+    - Memory stays below (window_hours x capacity) counters however many keywords arrive.
+    - Growth compares the hourly rate of the last `recent_hours` against the older part of the window.
+    """
+
+    def __init__(self, window_hours: int, recent_hours: int, capacity: int):
+        self.window_hours = window_hours
+        self.recent_hours = min(recent_hours, window_hours)
+        self.capacity = capacity
+        self.buckets = OrderedDict()  # bucket start -> SpaceSaving, oldest first
+        self.started_at = None
+        self.scored_keywords = set()  # keywords this process has written a trend score for
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def bucket_start(moment: datetime) -> datetime:
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    def expire(self, now: datetime) -> bool:
+        """Drops buckets that left the window. Returns True when `now` opens a new bucket."""
+        oldest_kept = self.bucket_start(now) - BUCKET_SIZE * (self.window_hours - 1)
+        while self.buckets and next(iter(self.buckets)) < oldest_kept:
+            self.buckets.popitem(last=False)
+        return self.bucket_start(now) not in self.buckets
+
+    def record(self, keyword_counts, now: datetime = None) -> bool:
+        """Adds {keyword: count} to the current bucket. Returns True when a new hourly bucket was opened."""
+        now = now or datetime.utcnow()
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = self.bucket_start(now)
+            rolled_over = self.expire(now)
+            bucket = self.buckets.setdefault(self.bucket_start(now), SpaceSaving(self.capacity))
+            for keyword, count in keyword_counts.items():
+                bucket.add(keyword, count)
+        return rolled_over
+
+    def tracked_keywords(self):
+        with self.lock:
+            return set().union(*(bucket.counts for bucket in self.buckets.values()))
+
+    def scores(self, keywords, now: datetime = None):
+        """
+        Returns {keyword: (trend_score, trend_growth)}.
+        - growth = recent hourly rate / baseline hourly rate - 1, with one pseudo-count of smoothing.
+        - score = recent count x (1 + positive growth).
+        Growth stays 0 until the window has seen some baseline history.
+        """
+        now = now or datetime.utcnow()
+        current = self.bucket_start(now)
+        recent_after = current - BUCKET_SIZE * self.recent_hours
+
+        with self.lock:
+            self.expire(now)
+            history_hours = (current - self.started_at) / BUCKET_SIZE + 1 if self.started_at else 0
+            baseline_hours = min(history_hours, self.window_hours) - self.recent_hours
+            recent_buckets = [bucket for start, bucket in self.buckets.items() if start > recent_after]
+            baseline_buckets = [bucket for start, bucket in self.buckets.items() if start <= recent_after]
+
+            results = {}
+            for keyword in keywords:
+                recent = sum(bucket.estimate(keyword) for bucket in recent_buckets)
+                if baseline_hours > 0:
+                    baseline = sum(bucket.estimate(keyword) for bucket in baseline_buckets)
+                    smoothing = 1 / baseline_hours
+                    growth = (recent / self.recent_hours + smoothing) / (baseline / baseline_hours + smoothing) - 1
+                else:
+                    growth = 0.0
+                results[keyword] = (round(recent * (1 + max(growth, 0.0)), 4), round(growth, 4))
+        return results
+
+trend_window = TrendWindow(TREND_WINDOW_HOURS, TREND_RECENT_HOURS, TREND_SKETCH_CAPACITY)
+
+def write_trend_scores(scores, db: Session):
+    """Bulk-writes {keyword: (score, growth)} onto trending_topics in one executemany."""
+    if not scores:
+        return
+    table = TrendingTopic.__table__
+    db.execute(
+        update(table)
+        .where(table.c.keyword == bindparam("b_keyword"))
+        .values(trend_score=bindparam("b_score"), trend_growth=bindparam("b_growth")),
+        [
+            {"b_keyword": keyword, "b_score": score, "b_growth": growth}
+            for keyword, (score, growth) in sorted(scores.items())
+        ]
+    )
+
+def update_trend_scores(keyword_counts, db: Session, now: datetime = None):
+    """
+    Records this batch's keyword counts in the rolling window and refreshes trend_score / trend_growth.
+    Only the batch's keywords are rewritten, except at the first call of each hour. Then every tracked
+    keyword is rescored and keywords this process scored earlier but that dropped out of its window are
+    reset to 0, so idle topics decay. Rows only other workers scored are left alone.
+    The caller commits.
+    """
+    now = now or datetime.utcnow()
+    rolled_over = trend_window.record(keyword_counts, now)
+
+    if rolled_over:
+        keywords = trend_window.tracked_keywords()
+        scores = trend_window.scores(keywords, now)
+        with trend_window.lock:
+            dropped = trend_window.scored_keywords - keywords
+            trend_window.scored_keywords = set(keywords)
+        scores.update({keyword: (0.0, 0.0) for keyword in dropped})
+    else:
+        scores = trend_window.scores(keyword_counts.keys(), now)
+        with trend_window.lock:
+            trend_window.scored_keywords.update(keyword_counts)
+
+    write_trend_scores(scores, db)
+
+def top_rising_keywords(limit: int, db: Session):
+    """Top `limit` keywords by trend growth, read through the trend_growth index (no videos scan)."""
+    topics = (
+        db.query(TrendingTopic)
+        .filter(TrendingTopic.trend_score > 0)
+        .order_by(TrendingTopic.trend_growth.desc(), TrendingTopic.trend_score.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "keyword": topic.keyword,
+            "trend_score": topic.trend_score,
+            "trend_growth": topic.trend_growth,
+            "count": topic.count,
+            "video_id": topic.video_id,
+        }
+        for topic in topics
+    ]
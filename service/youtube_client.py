@@ -0,0 +1,132 @@
+import time
+import random
+import asyncio
+import threading
+import httpx
+from service.quota_service import quota_manager
+from service.response_cache import response_cache
+from config import YOUTUBE_API_KEY, YOUTUBE_HTTP_TIMEOUT, YOUTUBE_HTTP_MAX_RETRIES
+
+BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+POOL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60)
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> httpx.Client:
+    """Returns the process-wide keep-alive client used for synchronous calls."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(base_url=BASE_URL, limits=POOL_LIMITS, timeout=YOUTUBE_HTTP_TIMEOUT)
+    return _client
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the keep-alive client used by async routes (created on the running event loop)."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(base_url=BASE_URL, limits=POOL_LIMITS, timeout=YOUTUBE_HTTP_TIMEOUT)
+    return _async_client
+
+async def close_clients():
+    """Closes pooled connections, called on application shutdown."""
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, base * 2^attempt), capped."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+def build_params(params: dict) -> dict:
+    """Adds the API key unless the caller already supplied one."""
+    return {**params, "key": params.get("key") or YOUTUBE_API_KEY}
+
+def youtube_get(endpoint: str, params: dict, timeout: float = None, use_cache: bool = True, user_id=None) -> dict:
+    """
+    GET a YouTube Data API endpoint (e.g. "search", "videos", "channels") and return the JSON body.
+    - Serves fresh responses from the response cache when `use_cache` is set.
+    - Charges cache misses to `user_id` and raises QuotaExceededError when the budget is spent.
+    - Reuses pooled connections.
+    - Retries transport errors, 429 and 5xx with jittered exponential backoff.
+    - Error bodies for non-retryable statuses are returned as-is, like the API reports them.
+    """
+    if use_cache:
+        cached = response_cache.get(endpoint, params)
+        if cached is not None:
+            return cached
+
+    quota_manager.charge(endpoint, user_id)
+    data = request_with_retries(endpoint, params, timeout)
+    if use_cache:
+        response_cache.set(endpoint, params, data)
+    return data
+
+async def youtube_get_async(endpoint: str, params: dict, timeout: float = None, use_cache: bool = True, user_id=None) -> dict:
+    """Async counterpart of youtube_get with the same caching, quota, retry and timeout behaviour."""
+    if use_cache:
+        cached = await cache_lookup_async(endpoint, params)
+        if cached is not None:
+            return cached
+
+    await asyncio.to_thread(quota_manager.charge, endpoint, user_id)
+    data = await request_with_retries_async(endpoint, params, timeout)
+    if use_cache:
+        if response_cache.persistent:
+            await asyncio.to_thread(response_cache.set, endpoint, params, data)
+        else:
+            response_cache.set(endpoint, params, data)
+    return data
+
+async def cache_lookup_async(endpoint: str, params: dict):
+    # The persistent tier hits the database, so keep it off the event loop.
+    if response_cache.persistent:
+        return await asyncio.to_thread(response_cache.get, endpoint, params)
+    return response_cache.get(endpoint, params)
+
+def request_with_retries(endpoint: str, params: dict, timeout: float = None) -> dict:
+    params = build_params(params)
+    timeout = timeout or YOUTUBE_HTTP_TIMEOUT
+
+    for attempt in range(YOUTUBE_HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == YOUTUBE_HTTP_MAX_RETRIES
+        try:
+            response = get_client().get(f"/{endpoint}", params=params, timeout=timeout)
+        except httpx.TransportError as e:
+            if last_attempt:
+                raise
+            print(f"YouTube {endpoint} request failed ({e}), retrying...")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response.json()
+            print(f"YouTube {endpoint} returned {response.status_code}, retrying...")
+        time.sleep(backoff_delay(attempt))
+
+async def request_with_retries_async(endpoint: str, params: dict, timeout: float = None) -> dict:
+    params = build_params(params)
+    timeout = timeout or YOUTUBE_HTTP_TIMEOUT
+
+    for attempt in range(YOUTUBE_HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == YOUTUBE_HTTP_MAX_RETRIES
+        try:
+            response = await get_async_client().get(f"/{endpoint}", params=params, timeout=timeout)
+        except httpx.TransportError as e:
+            if last_attempt:
+                raise
+            print(f"YouTube {endpoint} request failed ({e}), retrying...")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response.json()
+            print(f"YouTube {endpoint} returned {response.status_code}, retrying...")
+        await asyncio.sleep(backoff_delay(attempt))
@@ -1,36 +1,31 @@
-import os
 import re
-import requests
-from database.models import Video
+import asyncio
+from database.models import Video, Channel, VideoStatsSnapshot
 from config import YOUTUBE_API_KEY
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime, timedelta
-from sqlalchemy.exc import IntegrityError
-from service.engagement_service import (
-    calculate_view_to_subscriber_ratio,
-    calculate_view_velocity,
-    calculate_engagement_rate,
-)
-
-BASE_URL = "https://www.googleapis.com/youtube/v3"
-YOUTUBE_SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-session = Session()
-
-def fetch_video_thumbnails(keyword):
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func
+from service.search_index import search_stored_videos
+from database.db_connection import SessionLocal, dialect_insert, session_scope
+from service.youtube_client import youtube_get, youtube_get_async
+from service.quota_service import quota_manager, QuotaExceededError
+from service.snapshot_service import load_recent_snapshots, apply_snapshot_metrics
+from service.channel_service import resolve_channel_subscribers, resolve_channel_subscribers_async
+from service.engagement_service import apply_engagement_metrics
+
+def fetch_video_thumbnails(keyword, user_id=None):
     params = {
         "part": "snippet",
         "q": keyword,
         "maxResults": 10,
         "type": "video",
-        "key": YOUTUBE_API_KEY
     }
     
-    response = requests.get(YOUTUBE_SEARCH_URL, params=params).json()
+    try:
+        response = youtube_get("search", params, user_id=user_id)
+    except QuotaExceededError as e:
+        print(f"{e} Skipping thumbnail search.")
+        return []
     print("YouTube API Response:", response)
     videos = []
     
@@ -65,19 +60,16 @@ def get_published_after(filter_option):
     
     return None 
 
-def fetch_youtube_videos(query, max_results=10, duration_category=None, min_views=None, min_subscribers=None, upload_date=None):
-    """Fetch YouTube videos with optional filters, excluding Shorts (videos under 60 seconds)."""
-    
-    if not YOUTUBE_API_KEY:
-        raise ValueError("YouTube API Key is missing. Check your .env file.")
+SEARCH_PAGE_SIZE = 50  # Maximum maxResults accepted by search.list
+MAX_FILTER_PAGES = 5  # Upper bound on extra search pages (100 units each) pulled to satisfy filters
 
-    search_url = f"{BASE_URL}/search"
+def build_search_params(query, max_results=10, duration_category=None, upload_date=None):
+    """Builds search.list parameters for the given filters."""
     search_params = {
         "part": "snippet",
         "q": query,
         "type": "video",
         "maxResults": max_results,
-        "key": YOUTUBE_API_KEY,
     }
 
     if upload_date:
@@ -88,10 +80,18 @@ def fetch_youtube_videos(query, max_results=10, duration_category=None, min_view
     if duration_category:
         search_params["videoDuration"] = duration_category  
 
-    search_response = requests.get(search_url, params=search_params).json()
+    return search_params
+
+def parse_upload_date(value):
+    """ISO 8601 `publishedAt` (e.g. "2024-05-01T12:00:00Z") as a naive UTC datetime for the DateTime column."""
+    if not value or isinstance(value, datetime):
+        return value or None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def parse_search_items(search_response):
+    """Extracts video dicts from a search.list response, skipping Shorts."""
     videos = []
-    video_ids = []
-    channel_ids = []
 
     for item in search_response.get("items", []):
         video_id = item["id"]["videoId"]
@@ -108,32 +108,36 @@ def fetch_youtube_videos(query, max_results=10, duration_category=None, min_view
             "title": title,
             "channel_id": channel_id,
             "channel_name": item["snippet"]["channelTitle"],
+            "description": item["snippet"].get("description", ""),
             "upload_date": upload_date,
             "thumbnail": thumbnail_url,
             "video_url": f"https://www.youtube.com/watch?v={video_id}"
         })
-        video_ids.append(video_id)
-        channel_ids.append(channel_id)
 
-    if not video_ids:
-        return []
+    return videos
 
-    stats_url = f"{BASE_URL}/videos"
-    stats_params = {
+def build_stats_params(videos):
+    return {
         "part": "statistics,contentDetails",
-        "id": ",".join(video_ids),
-        "key": YOUTUBE_API_KEY
+        "id": ",".join(video["video_id"] for video in videos),
     }
-    stats_response = requests.get(stats_url, params=stats_params).json()
+
+def apply_video_statistics(videos, stats_response, duration_category=None):
+    """Merges videos.list statistics into the search results and applies the duration filter."""
+    videos_by_id = {video["video_id"]: video for video in videos}
 
     filtered_videos = []
     
-    for i, item in enumerate(stats_response.get("items", [])):
+    for item in stats_response.get("items", []):
+        video = videos_by_id.get(item.get("id"))
+        if video is None:
+            continue
+
         stats = item.get("statistics", {})
         duration_str = item.get("contentDetails", {}).get("duration", "PT0S")
         video_duration = parse_duration_to_seconds(duration_str)
 
-        print(f"Video ID: {video_ids[i]} | Duration: {video_duration} seconds")  
+        print(f"Video ID: {video['video_id']} | Duration: {video_duration} seconds")  
 
         if video_duration == 0:
             continue
@@ -148,44 +152,218 @@ def fetch_youtube_videos(query, max_results=10, duration_category=None, min_view
         if duration_category and duration_category != video_duration_label:
             continue  
 
-        videos[i]["views"] = int(stats.get("viewCount", 0))
-        videos[i]["likes"] = int(stats.get("likeCount", 0))
-        videos[i]["comments"] = int(stats.get("commentCount", 0))
-        videos[i]["duration"] = video_duration
-        videos[i]["videoDuration"] = video_duration_label  #
+        video["views"] = int(stats.get("viewCount", 0))
+        video["likes"] = int(stats.get("likeCount", 0))
+        video["comments"] = int(stats.get("commentCount", 0))
+        video["duration"] = video_duration
+        video["videoDuration"] = video_duration_label
 
-        channels_url = f"{BASE_URL}/channels"
-        channels_params = {
-            "part": "statistics",
-            "id": ",".join(set(channel_ids)),
-            "key": YOUTUBE_API_KEY
-        }
-        channels_response = requests.get(channels_url, params=channels_params).json()
+        filtered_videos.append(video)
 
-        channel_subscribers = {item["id"]: int(item["statistics"].get("subscriberCount", 0)) 
-                               for item in channels_response.get("items", [])}
+    return filtered_videos
 
-        video = videos[i]
+def apply_channel_metrics(videos, channel_subscribers):
+    """Adds subscriber counts, then computes the engagement metrics for the whole batch in one pass."""
+    for video in videos:
         video["subscribers"] = channel_subscribers.get(video["channel_id"], 0)
-        video["view_to_subscriber_ratio"] = calculate_view_to_subscriber_ratio(video["views"], video["subscribers"])
-        video["view_velocity"] = calculate_view_velocity(video)
-        video["engagement_rate"] = calculate_engagement_rate(video)
+    apply_engagement_metrics(videos)
 
-        clicks = video["likes"]
-        impressions = video["views"]
-        video["ctr"] = calculate_ctr(clicks, impressions)
+def rank_videos(videos):
+    videos.sort(key=lambda x: (x["view_to_subscriber_ratio"], x["view_velocity"], x["engagement_rate"]), reverse=True)
+    return videos
+
+def video_to_dict(video: Video) -> dict:
+    """Serializes a stored Video row in the same shape as live search results."""
+    return {
+        "video_id": video.video_id,
+        "title": video.title,
+        "channel_id": video.channel_id,
+        "channel_name": video.channel_name,
+        "upload_date": video.upload_date.isoformat() if video.upload_date else None,
+        "thumbnail": video.thumbnail,
+        "video_url": video.video_url,
+        "views": video.views,
+        "likes": video.likes,
+        "comments": video.comments,
+        "subscribers": video.subscribers,
+        "engagement_rate": video.engagement_rate,
+        "view_to_subscriber_ratio": video.view_to_subscriber_ratio,
+        "view_velocity": video.view_velocity,
+        "view_acceleration": video.view_acceleration,
+        "updated_at": video.updated_at.isoformat() if video.updated_at else None,
+    }
 
-        filtered_videos.append(videos[i])
+def find_stored_videos(query, max_results, db, min_views=None, min_subscribers=None):
+    """Serves matching videos from the full-text index over the `videos` table; spends no API quota."""
+    return [
+        {**video_to_dict(video), "source": "database", "search_score": round(score, 6), "is_fresh": is_fresh}
+        for video, score, is_fresh in search_stored_videos(query, max_results, db, min_views, min_subscribers)
+    ]
+
+def filter_min_views(videos, min_views=None):
+    if not min_views:
+        return videos
+    return [video for video in videos if video["views"] >= min_views]
+
+def filter_min_subscribers(videos, min_subscribers=None):
+    if not min_subscribers:
+        return videos
+    return [video for video in videos if video["subscribers"] >= min_subscribers]
+
+def search_page_params(query, max_results, duration_category, upload_date, page_token=None, filtered=False):
+    """
+    search.list parameters for one page.
+    Filtered searches always ask for a full page: a search costs 100 units whatever its size.
+    """
+    params = build_search_params(query, SEARCH_PAGE_SIZE if filtered else max_results, duration_category, upload_date)
+    if page_token:
+        params["pageToken"] = page_token
+    return params
+
+def fetch_youtube_videos(query, max_results=10, duration_category=None, min_views=None, min_subscribers=None, upload_date=None, user_id=None, db=None):
+    """
+    Fetch YouTube videos with optional filters, excluding Shorts (videos under 60 seconds).
+    - min_views is applied right after the stats call, before the channel lookup.
+    - min_subscribers is applied after the channel lookup, before the database write.
+    - When filters leave fewer than max_results, further pages are searched (up to MAX_FILTER_PAGES).
+    - Database work uses `db`, or a short-lived session when the caller has none.
+    """
     
-    filtered_videos.sort(key=lambda x: (x["view_to_subscriber_ratio"], x["view_velocity"], x["engagement_rate"]), reverse=True)
-    store_videos_in_db(filtered_videos)  
-    return filtered_videos
+    if not YOUTUBE_API_KEY:
+        raise ValueError("YouTube API Key is missing. Check your .env file.")
+
+    with session_scope(db) as db:
+        # A search costs 100 units; fall back to stored videos instead of failing mid-pipeline.
+        if not quota_manager.can_afford("search", user_id):
+            return find_stored_videos(query, max_results, db, min_views, min_subscribers)
+
+        filtered = bool(min_views or min_subscribers)
+        collected = []
+        page_token = None
+
+        for _ in range(MAX_FILTER_PAGES if filtered else 1):
+            try:
+                search_response = youtube_get("search", search_page_params(query, max_results, duration_category, upload_date, page_token, filtered), user_id=user_id)
+                videos = parse_search_items(search_response)
+                stats_response = youtube_get("videos", build_stats_params(videos), user_id=user_id) if videos else {}
+            except QuotaExceededError as e:
+                if collected:
+                    print(f"{e} Returning the {len(collected)} videos found so far.")
+                    break
+                print(f"{e} Serving stored videos instead.")
+                return find_stored_videos(query, max_results, db, min_views, min_subscribers)
+
+            page_videos = filter_min_views(apply_video_statistics(videos, stats_response, duration_category), min_views)
+
+            # One batched lookup for every channel in the page instead of one per video.
+            channel_subscribers = resolve_channel_subscribers([video["channel_id"] for video in page_videos], db, user_id=user_id)
+            apply_channel_metrics(page_videos, channel_subscribers)
+            collected.extend(filter_min_subscribers(page_videos, min_subscribers))
+
+            page_token = search_response.get("nextPageToken")
+            if len(collected) >= max_results or not page_token:
+                break
+
+        # Storing refines view_velocity from snapshot deltas, so rank afterwards.
+        store_videos_in_db(collected, db)
+        return rank_videos(collected)[:max_results]
+
+async def fetch_youtube_videos_async(query, max_results=10, duration_category=None, min_views=None, min_subscribers=None, upload_date=None, db=None, user_id=None):
+    """
+    Async variant of fetch_youtube_videos for async routes, with the same filter push-down.
+    Without min_views, the videos.list call and the channel lookup only depend on the search results, so they run concurrently.
+    """
+    if not YOUTUBE_API_KEY:
+        raise ValueError("YouTube API Key is missing. Check your .env file.")
 
-def calculate_ctr(clicks, impressions):
-    """Calculate the CTR (Click-Through Rate)."""
-    if impressions == 0:
-        return 0  
-    return round((clicks / impressions) * 100, 2)
+    with session_scope(db) as db:
+        if not quota_manager.can_afford("search", user_id):
+            return await asyncio.to_thread(find_stored_videos, query, max_results, db, min_views, min_subscribers)
+
+        filtered = bool(min_views or min_subscribers)
+        collected = []
+        page_token = None
+
+        for _ in range(MAX_FILTER_PAGES if filtered else 1):
+            try:
+                search_response = await youtube_get_async("search", search_page_params(query, max_results, duration_category, upload_date, page_token, filtered), user_id=user_id)
+                videos = parse_search_items(search_response)
+                if videos:
+                    collected.extend(await enrich_videos_async(videos, duration_category, db, user_id, min_views, min_subscribers))
+            except QuotaExceededError as e:
+                if collected:
+                    print(f"{e} Returning the {len(collected)} videos found so far.")
+                    break
+                print(f"{e} Serving stored videos instead.")
+                return await asyncio.to_thread(find_stored_videos, query, max_results, db, min_views, min_subscribers)
+
+            page_token = search_response.get("nextPageToken")
+            if len(collected) >= max_results or not page_token:
+                break
+
+        await asyncio.to_thread(store_videos_in_db, collected, db)
+        return rank_videos(collected)[:max_results]
+
+async def enrich_videos_async(videos, duration_category, db, user_id=None, min_views=None, min_subscribers=None):
+    """
+    Adds statistics, subscriber counts and metrics to search results, dropping videos below the filters.
+    With min_views the channel lookup waits for the stats so filtered-out videos cost no channel work.
+    """
+    if min_views:
+        stats_response = await youtube_get_async("videos", build_stats_params(videos), user_id=user_id)
+        filtered_videos = filter_min_views(apply_video_statistics(videos, stats_response, duration_category), min_views)
+        channel_subscribers = await resolve_channel_subscribers_async([video["channel_id"] for video in filtered_videos], db, user_id=user_id)
+    else:
+        stats_response, channel_subscribers = await asyncio.gather(
+            youtube_get_async("videos", build_stats_params(videos), user_id=user_id),
+            resolve_channel_subscribers_async([video["channel_id"] for video in videos], db, user_id=user_id),
+        )
+        filtered_videos = apply_video_statistics(videos, stats_response, duration_category)
+
+    apply_channel_metrics(filtered_videos, channel_subscribers)
+    return filter_min_subscribers(filtered_videos, min_subscribers)
+
+async def iter_youtube_video_pages(query, total_results=SEARCH_PAGE_SIZE, duration_category=None, upload_date=None, db=None, user_id=None, min_views=None, min_subscribers=None):
+    """
+    Async generator walking search result pages via nextPageToken.
+    - Yields each page enriched, ranked and stored.
+    - Requests the next search page while the current one is being enriched, never more than one page ahead.
+    - Database work uses `db`, or a session held open until the generator finishes.
+    """
+    if not YOUTUBE_API_KEY:
+        raise ValueError("YouTube API Key is missing. Check your .env file.")
+
+    with session_scope(db) as db:
+        requested = 0
+
+        def next_page(page_token):
+            nonlocal requested
+            page_size = min(SEARCH_PAGE_SIZE, total_results - requested)
+            requested += page_size
+            params = build_search_params(query, page_size, duration_category, upload_date)
+            if page_token:
+                params["pageToken"] = page_token
+            return asyncio.create_task(youtube_get_async("search", params, user_id=user_id))
+
+        pending_search = next_page(None)
+        try:
+            while pending_search is not None:
+                search_response = await pending_search
+                page_token = search_response.get("nextPageToken")
+                pending_search = next_page(page_token) if page_token and requested < total_results else None
+
+                videos = parse_search_items(search_response)
+                if not videos:
+                    continue
+
+                page = await enrich_videos_async(videos, duration_category, db, user_id, min_views, min_subscribers)
+                if not page:
+                    continue
+                await asyncio.to_thread(store_videos_in_db, page, db)
+                yield rank_videos(page)
+        finally:
+            if pending_search is not None and not pending_search.done():
+                pending_search.cancel()
 
 def parse_duration_to_seconds(duration):
     """Convert ISO 8601 duration (e.g., PT1H2M30S) to total seconds."""
@@ -212,50 +390,107 @@ if __name__ == "__main__":
     for video in results:
         print(f"{video['title']} | Duration: {video['duration']}s | Views: {video['views']}")
 
-def store_videos_in_db(videos):
-    """Store fetched videos in the database."""
-    for video in videos:
-        existing_video = session.query(Video).filter_by(video_id=video["video_id"]).first()
-        if existing_video:
-            continue
-        
-        new_video = Video(
-            video_id=video["video_id"],
-            title=video["title"],
-            channel_id=video["channel_id"],
-            channel_name=video["channel_name"],
-            upload_date=video["upload_date"],
-            thumbnail=video["thumbnail"],
-            video_url=video["video_url"],
-            views=video["views"],
-            likes=video["likes"],
-            comments=video["comments"],
-            subscribers=video["subscribers"],
-            view_to_subscriber_ratio=video["view_to_subscriber_ratio"],
-            view_velocity=video["view_velocity"],
-            engagement_rate=video["engagement_rate"]
+VIDEO_REFRESH_COLUMNS = (
+    "title", "thumbnail", "views", "likes", "comments", "subscribers",
+    "engagement_rate", "view_to_subscriber_ratio", "view_velocity", "view_acceleration", "updated_at",
+)
+
+def store_videos_in_db(videos, db=None):
+    """
+    Upserts fetched videos and their channels in one transaction.
+    - New videos are inserted; existing ones get refreshed metric columns.
+    - Parent channels are inserted if missing so the videos foreign key holds.
+    - A stats snapshot is appended when due, and view velocity/acceleration are
+      updated on the video dicts from snapshot deltas.
+    """
+    videos = list({video["video_id"]: video for video in videos}.values())
+    if not videos:
+        return
+
+    own_session = db is None
+    db = db or SessionLocal()
+    now = datetime.utcnow()
+    try:
+        snapshots = load_recent_snapshots([video["video_id"] for video in videos], db)
+        snapshot_rows = apply_snapshot_metrics(videos, snapshots, now)
+
+        channel_rows = list({
+            video["channel_id"]: {
+                "channel_id": video["channel_id"],
+                "name": video["channel_name"],
+                "total_subscribers": video.get("subscribers", 0),
+                "updated_at": None,  # Leave freshness to the channel resolver
+            }
+            for video in videos
+        }.values())
+        video_rows = [
+            {
+                "video_id": video["video_id"],
+                "title": video["title"],
+                "description": video.get("description"),
+                "channel_id": video["channel_id"],
+                "channel_name": video["channel_name"],
+                "upload_date": parse_upload_date(video["upload_date"]),
+                "thumbnail": video["thumbnail"],
+                "video_url": video["video_url"],
+                "views": video["views"],
+                "likes": video["likes"],
+                "comments": video["comments"],
+                "subscribers": video["subscribers"],
+                "view_to_subscriber_ratio": video["view_to_subscriber_ratio"],
+                "view_velocity": video["view_velocity"],
+                "view_acceleration": video["view_acceleration"],
+                "engagement_rate": video["engagement_rate"],
+                "updated_at": now,
+            }
+            for video in videos
+        ]
+
+        channel_stmt = dialect_insert(db, Channel).values(channel_rows)
+        channel_stmt = channel_stmt.on_conflict_do_update(
+            index_elements=["channel_id"],
+            set_={"name": channel_stmt.excluded.name}
+        )
+        video_stmt = dialect_insert(db, Video).values(video_rows)
+        video_stmt = video_stmt.on_conflict_do_update(
+            index_elements=["video_id"],
+            set_={
+                **{column: video_stmt.excluded[column] for column in VIDEO_REFRESH_COLUMNS},
+                "description": func.coalesce(video_stmt.excluded.description, Video.description),
+            }
         )
 
-        try:
-            session.add(new_video)
-            session.commit()
-        except IntegrityError:
-            session.rollback()
-            print(f"Video {video['video_id']} already exists in the database.")
-
-def fetch_video_by_id(video_id):
-    """Fetch details for a single video using its video ID."""
+        db.execute(channel_stmt)
+        db.execute(video_stmt)
+        if snapshot_rows:
+            db.execute(dialect_insert(db, VideoStatsSnapshot).values(snapshot_rows).on_conflict_do_nothing())
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Failed to store {len(videos)} videos: {e}")
+    finally:
+        if own_session:
+            db.close()
+
+def fetch_video_by_id(video_id, user_id=None, db=None):
+    """Fetch details for a single video using its video ID; database work uses `db`, or a short-lived session."""
     if not YOUTUBE_API_KEY:
         raise ValueError("YouTube API Key is missing. Check your .env file.")
 
-    url = f"{BASE_URL}/videos"
     params = {
         "part": "snippet,statistics,contentDetails",
         "id": video_id,
-        "key": YOUTUBE_API_KEY
     }
 
-    response = requests.get(url, params=params).json()
+    try:
+        response = youtube_get("videos", params, user_id=user_id)
+    except QuotaExceededError as e:
+        print(f"{e} Serving the stored video instead.")
+        with session_scope(db) as scoped_db:
+            stored_video = scoped_db.query(Video).filter_by(video_id=video_id).first()
+            if not stored_video:
+                return {"error": "YouTube quota exhausted and video is not stored"}
+            return {**video_to_dict(stored_video), "description": stored_video.description, "source": "database"}
 
     if "items" not in response or not response["items"]:
         return {"error": "Video not found"}
@@ -267,18 +502,8 @@ def fetch_video_by_id(video_id):
     video_duration = parse_duration_to_seconds(duration_str)
 
     channel_id = item["snippet"]["channelId"]
-    channel_url = f"{BASE_URL}/channels"
-    channel_params = {
-        "part": "statistics",
-        "id": channel_id,
-        "key": YOUTUBE_API_KEY
-    }
-    
-    channel_response = requests.get(channel_url, params=channel_params).json()
-    subscribers = 0  
-
-    if "items" in channel_response and channel_response["items"]:
-        subscribers = int(channel_response["items"][0]["statistics"].get("subscriberCount", 0))
+    with session_scope(db) as scoped_db:
+        subscribers = resolve_channel_subscribers([channel_id], scoped_db, user_id=user_id).get(channel_id, 0)
 
     video_details = {
         "video_id": video_id,
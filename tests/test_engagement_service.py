@@ -0,0 +1,14 @@
+from service.engagement_service import apply_engagement_metrics, calculate_engagement_rate
+
+def test_missing_or_non_numeric_counts_score_as_zero():
+    videos = apply_engagement_metrics([
+        {"views": "abc", "likes": None, "comments": "3", "subscribers": "n/a", "upload_date": "2024-05-01T12:00:00Z"},
+        {"likes": 5},
+        {"views": "200", "likes": "10", "comments": 0, "subscribers": 100, "upload_date": None},
+    ])
+
+    assert videos[0]["engagement_rate"] == 0.0
+    assert videos[0]["view_to_subscriber_ratio"] == 0.0
+    assert videos[1]["view_velocity"] == 0.0
+    assert videos[2]["engagement_rate"] == calculate_engagement_rate(videos[2]) == 5.0
+    assert videos[2]["view_to_subscriber_ratio"] == 2.0
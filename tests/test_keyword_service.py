@@ -0,0 +1,35 @@
+from datetime import datetime
+from database.models import Base, Video, Channel, KeywordDocumentFrequency, KeywordCorpus
+from database.db_connection import engine, SessionLocal
+from service import keyword_service, utils
+from service.keyword_service import extract_corpus_keywords
+
+def test_corpus_keywords_tokenize_the_batch_once(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for model in (KeywordDocumentFrequency, KeywordCorpus, Video, Channel):
+        db.query(model).delete()
+    db.add(Channel(channel_id="c1", name="Channel"))
+    for video_id in ("a", "b", "c"):
+        db.add(Video(video_id=video_id, title="t", channel_id="c1", channel_name="Channel",
+                     upload_date=datetime(2026, 1, 1), video_url=f"https://www.youtube.com/watch?v={video_id}"))
+    db.commit()
+
+    calls = []
+    build_term_counts = utils.build_term_counts
+    def counting_build(texts):
+        calls.append(list(texts))
+        return build_term_counts(texts)
+    monkeypatch.setattr(keyword_service, "build_term_counts", counting_build)
+    monkeypatch.setattr(utils, "build_term_counts", counting_build)
+
+    videos = [{"video_id": "a", "title": "keto recipes"}, {"video_id": "b", "title": "keto breakfast"}]
+    assert extract_corpus_keywords(videos, db)[0][-1] == "keto"
+    # Already counted: only the new video's terms reach the document frequencies.
+    extract_corpus_keywords(videos + [{"video_id": "c", "title": "budget travel"}], db)
+
+    assert len(calls) == 2
+    frequencies = dict(db.query(KeywordDocumentFrequency.term, KeywordDocumentFrequency.document_count).all())
+    assert frequencies == {"keto": 2, "recipes": 1, "breakfast": 1, "budget": 1, "travel": 1}
+    assert db.get(KeywordCorpus, 1).document_count == 3
+    db.close()
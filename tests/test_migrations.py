@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, inspect, text
+from database.models import Base
+from database.migrations import run_migrations, ADDED_COLUMNS, ADDED_INDEXES
+
+def legacy_engine(tmp_path):
+    """A database created by the current models, minus every migrated column and index."""
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    Base.metadata.create_all(bind=engine)
+    migrated = {(table, column) for table, column, _ in ADDED_COLUMNS}
+    with engine.begin() as connection:
+        for index_name, _, _ in ADDED_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        for table, column in migrated:
+            connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+    return engine
+
+def test_migrations_restore_columns_and_indexes(tmp_path):
+    engine = legacy_engine(tmp_path)
+    run_migrations(engine)
+    run_migrations(engine)  # idempotent
+
+    inspector = inspect(engine)
+    for table, column, _ in ADDED_COLUMNS:
+        assert column in {existing["name"] for existing in inspector.get_columns(table)}
+    for index_name, table, _ in ADDED_INDEXES:
+        assert index_name in {index["name"] for index in inspector.get_indexes(table)}
@@ -0,0 +1,36 @@
+import pytest
+from service.model_registry import ModelRegistry
+
+def test_non_blocking_acquire_returns_none_when_slots_are_taken():
+    registry = ModelRegistry()
+    registry.register("vosk", lambda: object(), concurrency=2)
+
+    first = registry.acquire("vosk", blocking=False)
+    second = registry.acquire("vosk", blocking=False)
+    assert first is second
+    assert registry.acquire("vosk", blocking=False) is None
+    assert registry.stats()["vosk"]["in_use"] == 2
+
+    registry.release("vosk")
+    assert registry.acquire("vosk", blocking=False) is first
+
+def test_failed_load_gives_the_slot_back():
+    registry = ModelRegistry()
+
+    def broken_loader():
+        raise RuntimeError("model files missing")
+
+    registry.register("vosk", broken_loader, concurrency=1)
+    # If the first failure leaked the only slot, the second call would return None instead of retrying the load.
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            registry.acquire("vosk", blocking=False)
+    assert registry.stats()["vosk"]["in_use"] == 0
+
+def test_use_releases_the_slot():
+    registry = ModelRegistry()
+    registry.register("whisper", lambda: "model", concurrency=1)
+    with registry.use("whisper") as model:
+        assert model == "model"
+        assert registry.acquire("whisper", blocking=False) is None
+    assert registry.acquire("whisper", blocking=False) == "model"
@@ -0,0 +1,62 @@
+import datetime
+import threading
+import pytest
+from database.models import Base, YoutubeQuotaLedger
+from database.db_connection import engine, SessionLocal
+from service import quota_service
+from service.quota_service import QuotaManager, QuotaExceededError
+
+@pytest.fixture
+def manager():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.query(YoutubeQuotaLedger).delete()
+    db.commit()
+    db.close()
+    return QuotaManager(global_capacity=250, user_capacity=150)
+
+def test_charges_until_the_user_budget_is_spent(manager):
+    manager.charge("search", user_id=1)
+    manager.charge("videos", user_id=1)
+    with pytest.raises(QuotaExceededError) as error:
+        manager.charge("search", user_id=1)
+    assert error.value.scope == "user"
+    assert manager.remaining(1) == {"global": 149, "user": 49}
+    assert manager.usage(1) == {"1": {"search": {"units": 100, "calls": 1}, "videos": {"units": 1, "calls": 1}}}
+
+def test_global_budget_is_shared_by_all_users(manager):
+    manager.charge("search", user_id=1)
+    manager.charge("search", user_id=2)
+    with pytest.raises(QuotaExceededError) as error:
+        manager.charge("search", user_id=3)
+    assert error.value.scope == "global"
+    # A refused call charges nothing.
+    assert manager.remaining(3) == {"global": 50, "user": 150}
+
+def test_budget_resets_on_the_next_pacific_day(manager, monkeypatch):
+    monkeypatch.setattr(quota_service, "quota_day", lambda: datetime.date(2026, 1, 1))
+    manager.charge("search", user_id=1)
+    assert not manager.can_afford("search", user_id=1)
+    monkeypatch.setattr(quota_service, "quota_day", lambda: datetime.date(2026, 1, 2))
+    assert manager.can_afford("search", user_id=1)
+
+def test_separate_managers_share_one_ledger(manager):
+    # Two QuotaManager instances stand in for two workers: together they cannot exceed the budget.
+    other_worker = QuotaManager(global_capacity=250, user_capacity=150)
+    charged = []
+
+    def spend(worker, user_id):
+        for _ in range(5):
+            try:
+                worker.charge("search", user_id=user_id)
+                charged.append(user_id)
+            except QuotaExceededError:
+                pass
+
+    threads = [threading.Thread(target=spend, args=(worker, user_id)) for worker, user_id in ((manager, 1), (other_worker, 2))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(charged) == 2
+    assert manager.remaining()["global"] == 50
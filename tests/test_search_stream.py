@@ -0,0 +1,29 @@
+import json
+import asyncio
+import httpx
+import pytest
+from routes import viral_idea_finder
+
+def collect_stream(response):
+    async def read():
+        return [chunk async for chunk in response.body_iterator]
+    return [json.loads(line) for line in asyncio.run(read())]
+
+@pytest.mark.parametrize("error", [
+    ValueError("YouTube API Key is missing. Check your .env file."),
+    httpx.ConnectError("connection refused"),
+])
+def test_stream_ends_with_an_error_record(monkeypatch, error):
+    async def failing_pages(*args, **kwargs):
+        yield [{"video_id": "abc123def45", "title": "First"}]
+        raise error
+
+    monkeypatch.setattr(viral_idea_finder, "iter_youtube_video_pages", failing_pages)
+    response = asyncio.run(viral_idea_finder.stream_videos(
+        "keto", total_results=100, duration_category=None, upload_date=None,
+        min_views=None, min_subscribers=None, format="ndjson", user=None,
+    ))
+
+    records = collect_stream(response)
+    assert records[0]["video_id"] == "abc123def45"
+    assert records[-1] == {"event": "error", "detail": str(error), "total": 1}
@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+from database.models import Base, Video, Channel, VideoStatsSnapshot
+from database.db_connection import engine, SessionLocal
+from service.youtube_service import store_videos_in_db, parse_upload_date
+
+def make_video(video_id, views=1000, published_at="2024-05-01T12:00:00Z"):
+    return {
+        "video_id": video_id,
+        "title": f"Video {video_id}",
+        "description": "description",
+        "channel_id": "channel-1",
+        "channel_name": "Channel",
+        "upload_date": published_at,
+        "thumbnail": "https://i.ytimg.com/vi/x/hqdefault.jpg",
+        "video_url": f"https://www.youtube.com/watch?v={video_id}",
+        "views": views,
+        "likes": 10,
+        "comments": 2,
+        "subscribers": 500,
+        "view_to_subscriber_ratio": views / 500,
+        "view_velocity": 0.0,
+        "view_acceleration": 0.0,
+        "engagement_rate": 1.2,
+    }
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    for model in (VideoStatsSnapshot, Video, Channel):
+        session.query(model).delete()
+    session.commit()
+    yield session
+    session.close()
+
+def test_parse_upload_date_returns_naive_utc():
+    assert parse_upload_date("2024-05-01T12:00:00Z") == datetime(2024, 5, 1, 12, 0, 0)
+    assert parse_upload_date("2024-05-01T14:00:00+02:00") == datetime(2024, 5, 1, 12, 0, 0)
+    assert parse_upload_date(None) is None
+
+def test_store_videos_round_trip_on_sqlite(db):
+    store_videos_in_db([make_video("abc123def45"), make_video("xyz987uvw65")])
+
+    stored = db.query(Video).order_by(Video.video_id).all()
+    assert [video.video_id for video in stored] == ["abc123def45", "xyz987uvw65"]
+    assert stored[0].upload_date == datetime(2024, 5, 1, 12, 0, 0)
+    assert db.query(Channel).filter_by(channel_id="channel-1").count() == 1
+
+def test_store_videos_refreshes_existing_rows(db):
+    store_videos_in_db([make_video("abc123def45", views=1000)])
+    store_videos_in_db([make_video("abc123def45", views=5000)])
+
+    db.expire_all()
+    video = db.query(Video).filter_by(video_id="abc123def45").one()
+    assert video.views == 5000
+    assert video.upload_date == datetime(2024, 5, 1, 12, 0, 0)
+
+def test_rescore_stored_videos_recomputes_engagement(db):
+    from service.engagement_service import rescore_stored_videos
+
+    store_videos_in_db([make_video("abc123def45", views=1000)])
+    db.query(Video).update({"engagement_rate": 0.0, "view_to_subscriber_ratio": 0.0})
+    db.commit()
+
+    assert rescore_stored_videos(db, chunk_size=1) == 1
+    db.expire_all()
+    video = db.query(Video).one()
+    assert video.view_to_subscriber_ratio == 2.0
+    assert video.engagement_rate > 0
@@ -0,0 +1,53 @@
+import pytest
+from service.title_cache_service import SemanticTitleCache, normalize_topic, guard_tokens
+
+@pytest.fixture
+def cache():
+    cache = SemanticTitleCache(threshold=0.92, max_entries=100)
+    cache._loaded = True  # skip the warm-up from generated_titles
+    cache.store("how to lose weight fast", ["weight titles"])
+    cache.store("iphone 15 review", ["iphone 15 titles"])
+    cache.store("minecraft hardcore", ["minecraft titles"])
+    return cache
+
+def test_normalize_topic_keeps_stop_words_and_order():
+    assert normalize_topic("How NOT to lose weight, fast!") == "how not to lose weight fast"
+    assert normalize_topic("weight lose to how") != normalize_topic("how to lose weight")
+
+def test_guard_tokens_picks_numbers_and_negations():
+    assert guard_tokens(normalize_topic("Don't buy the iPhone 16 without this")) == {"dont", "16", "without"}
+
+@pytest.mark.parametrize("topic", ["How to lose weight fast!", "how to lose weight, fast", "Minecraft Hardcore"])
+def test_punctuation_and_case_are_exact_hits(cache, topic):
+    assert cache.lookup(topic)[1] == "exact"
+
+def test_near_duplicate_is_a_semantic_hit(cache):
+    titles, kind, similarity = cache.lookup("how to lose the weight fast")
+    assert titles == ["weight titles"]
+    assert kind == "semantic"
+    assert similarity >= 0.92
+
+@pytest.mark.parametrize("topic", [
+    "how not to lose weight fast",
+    "don't lose weight fast",
+    "iphone 16 review",
+    "iphone 15 pro review",
+    "minecraft hardcore 1000 days",
+    "how to lose weight quickly",
+])
+def test_near_misses_with_different_meaning_are_not_served(cache, topic):
+    assert cache.lookup(topic) is None
+
+def test_video_urls_are_keyed_by_id_and_never_near_matched(cache):
+    cache.store("https://www.youtube.com/watch?v=dQwXgWcQaBc", ["video c titles"])
+
+    assert normalize_topic("https://youtu.be/dQwXgWcQaBc?t=42") == "video:dQwXgWcQaBc"
+    assert cache.lookup("https://youtu.be/dQwXgWcQaBc") == (["video c titles"], "exact", 1.0)
+    assert cache.lookup("https://www.youtube.com/watch?v=dQwXgWcQaBd") is None
+    # IDs are case-sensitive.
+    assert cache.lookup("https://www.youtube.com/watch?v=DQWXGWCQABC") is None
+
+def test_reworded_paraphrases_are_out_of_scope(cache):
+    # The n-gram match is lexical: a paraphrase with different wording is a miss, by design,
+    # because lowering the threshold far enough to catch it also lets different topics through.
+    assert cache.lookup("lose weight fast tips") is None
@@ -0,0 +1,35 @@
+from database.models import Base
+from database.db_connection import engine
+from service import title_generator_service
+from service.title_generator_service import stream_ai_titles
+
+class FakeStreamingLLM:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.prompts = []
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        return iter(self.chunks)
+
+def test_titles_completed_by_one_chunk_get_distinct_indexes(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    llm = FakeStreamingLLM(["1. First title\n2. Second", " title\n3. Third title\n4. Fourth", " title\n5. Fifth title"])
+    monkeypatch.setattr(title_generator_service, "get_title_llm", lambda output_format=None: llm)
+
+    events = list(stream_ai_titles("budget travel in japan", user_id=None, use_cache=False))
+
+    titles = [payload for event, payload in events if event == "title"]
+    assert [title["index"] for title in titles] == [0, 1, 2, 3, 4]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["titles"] == [title["title"] for title in titles]
+
+def test_stream_uses_video_metadata_for_urls(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    llm = FakeStreamingLLM(["1. Title\n"])
+    monkeypatch.setattr(title_generator_service, "get_title_llm", lambda output_format=None: llm)
+    monkeypatch.setattr(title_generator_service, "get_video_metadata", lambda url: ("Tokyo on $30 a day", "street food and hostels"))
+
+    list(stream_ai_titles("https://www.youtube.com/watch?v=abc123def45", user_id=None, use_cache=False))
+
+    assert "Tokyo on $30 a day" in llm.prompts[0]
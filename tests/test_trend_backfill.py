@@ -0,0 +1,42 @@
+from datetime import datetime
+import pytest
+from database.models import Base, TrendingTopic, Video, Channel, BackfillCheckpoint
+from database.db_connection import engine, SessionLocal
+from service.trend_backfill_service import backfill_trending_topics, live_counted_video_ids, JOB_NAME
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    for model in (TrendingTopic, BackfillCheckpoint, Video, Channel):
+        session.query(model).delete()
+    session.add(Channel(channel_id="c1", name="Channel"))
+    for video_id, title in (("a", "keto recipes"), ("b", "keto breakfast"), ("c", "budget travel")):
+        session.add(Video(video_id=video_id, title=title, channel_id="c1", channel_name="Channel",
+                          upload_date=datetime(2026, 1, 1), video_url=f"https://www.youtube.com/watch?v={video_id}"))
+    session.commit()
+    yield session
+    session.close()
+
+def test_backfill_keeps_trend_scores_and_prunes_dead_keywords(db):
+    db.add(TrendingTopic(video_id="a", keyword="keto", count=99, trend_score=4.0, trend_growth=0.5))
+    db.add(TrendingTopic(video_id="a", keyword="gone", count=3, trend_score=None))
+    db.commit()
+
+    backfill_trending_topics(db, restart=True, chunk_size=2, chunks_per_checkpoint=1)
+
+    topics = {topic.keyword: topic for topic in db.query(TrendingTopic)}
+    assert topics["keto"].count == 2
+    assert (topics["keto"].trend_score, topics["keto"].trend_growth) == (4.0, 0.5)
+    assert "gone" not in topics
+
+def test_live_counts_skip_videos_a_running_backfill_has_not_reached(db):
+    assert live_counted_video_ids({"a", "b", "c"}, db) == {"a", "b", "c"}
+
+    db.add(BackfillCheckpoint(job_name=JOB_NAME, status="running", processed_videos=0))
+    db.commit()
+    assert live_counted_video_ids({"a", "b", "c"}, db) == set()
+
+    db.get(BackfillCheckpoint, JOB_NAME).last_video_id = "b"
+    db.commit()
+    assert live_counted_video_ids({"a", "b", "c"}, db) == {"a", "b"}
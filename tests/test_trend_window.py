@@ -0,0 +1,46 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from database.models import Base, TrendingTopic, Video, Channel
+from database.db_connection import engine, SessionLocal
+from service import trend_window_service
+from service.trend_window_service import SpaceSaving, TrendWindow, update_trend_scores
+
+def test_space_saving_never_undercounts_and_bounds_the_error():
+    random.seed(7)
+    sketch = SpaceSaving(capacity=20)
+    truth = Counter()
+    for _ in range(5000):
+        keyword = f"k{int(random.paretovariate(1.2)) % 200}"
+        sketch.add(keyword)
+        truth[keyword] += 1
+
+    assert len(sketch.counts) == 20
+    for keyword, estimate in sketch.counts.items():
+        assert truth[keyword] <= estimate <= truth[keyword] + sketch.errors[keyword]
+    # The heaviest hitters survive eviction.
+    for keyword, _ in truth.most_common(3):
+        assert keyword in sketch.counts
+
+def test_rollover_resets_only_keywords_this_process_scored(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for model in (TrendingTopic, Video, Channel):
+        db.query(model).delete()
+    db.add(Channel(channel_id="c1", name="Channel"))
+    db.add(Video(video_id="v1", title="t", channel_id="c1", channel_name="Channel", upload_date=datetime(2026, 1, 1), video_url="https://www.youtube.com/watch?v=v1"))
+    for keyword in ("mine", "other_worker"):
+        db.add(TrendingTopic(video_id="v1", keyword=keyword, count=1, trend_score=5.0, trend_growth=1.0))
+    db.commit()
+
+    monkeypatch.setattr(trend_window_service, "trend_window", TrendWindow(window_hours=2, recent_hours=1, capacity=10))
+    start = datetime(2026, 1, 1, 10, 30)
+    update_trend_scores({"mine": 3}, db, start)
+    # Two hours later "mine" has left this process's window; "other_worker" was never scored here.
+    update_trend_scores({"fresh": 1}, db, start + timedelta(hours=2))
+    db.commit()
+
+    scores = {topic.keyword: topic.trend_score for topic in db.query(TrendingTopic)}
+    assert scores["mine"] == 0.0
+    assert scores["other_worker"] == 5.0
+    db.close()